@@ -1,11 +1,16 @@
-import datetime
+from functools import partial
 import asyncio
 import logging
-import pickle
+import time
+import os
 
 from discord.ext import commands
 import discord
 
+from storage import Database, SQLiteStorage, PickleStorage, import_pickle
+from utils import (
+    Cooldowns, RefreshScheduler, LRUCache, SingleFlight, HTTPStats,
+    MediaCache, ImageShrinker, create_session)
 from token_ import token
 
 
@@ -41,32 +46,95 @@ class ToastBot(commands.Bot):
             command_prefix=[], allowed_mentions=allowed_mentions,
             intents=intents)
 
-        self.times = {}
+        self.startup_times = {}
+        self.phase_started_at = time.perf_counter()
+
+        self.cooldowns = Cooldowns()
+        self.scheduler = RefreshScheduler(self.cooldowns)
+        self.message_cache = LRUCache(maxsize=2048)
+        self.flights = SingleFlight()
+        self.http_stats = HTTPStats()
+        self.http_session = None
+        self.media_cache = MediaCache("media_cache")
+        self.image_shrinker = ImageShrinker()
         self.emoji_ids = EMOJI_IDS
         self.db = self.load_db()
+        self.end_startup_phase("db open")
+        self.last_flush_duration = 0.0
+        self.flush_lock = asyncio.Lock()
         self.invoke_dict = {}
 
     async def setup_hook(self):
         self.owner = (await self.application_info()).owner
+        self.http_session = create_session(self.http_stats)
         self.cog_file_names = (
             "embed", "general", "hidden", "logging", "misc",
             "owner", "servers", "settings", "starboard")
 
+        self.phase_started_at = time.perf_counter()
+
+        # Each cog is timed on its own, importing it included
         for cog in self.cog_file_names:
             await self.load_extension(f"cogs.{cog}")
+            self.end_startup_phase(f"{cog} cog")
+
+    async def on_ready(self):
+        if "gateway ready" in self.startup_times:
+            return  # on_ready also happens after reconnecting
+
+        self.end_startup_phase("gateway ready")
+        phases = ", ".join(
+            f"{name} {seconds * 1000:.0f}ms"
+            for name, seconds in self.startup_times.items())
+
+        logging.info(f"Startup took {phases}")
+
+    def end_startup_phase(self, name):
+        """Note how long a part of starting up took, for the startup log."""
+        now = time.perf_counter()
+        self.startup_times[name] = now - self.phase_started_at
+        self.phase_started_at = now
 
     def load_db(self):
-        try:
-            with open("db.p", "rb") as file:
-                db = pickle.load(file)
-        except FileNotFoundError:
-            db = {"settings": {}, "starboard": {}, "old_starboard": {}}
+        """Open the storage and load the db, importing db.p the first time.
+
+        The db is kept in db.sqlite3, or as files in db/ if the
+        TOAST_STORAGE environment variable is set to "files".
+        """
+        if os.environ.get("TOAST_STORAGE", "sqlite") == "files":
+            path, storage_class = "db", PickleStorage
+        else:
+            path, storage_class = "db.sqlite3", SQLiteStorage
+
+        if not os.path.exists(path) and os.path.exists("db.p"):
+            entries = import_pickle("db.p", path, storage_class)
+            logging.info(f"Imported {entries} db entries from db.p")
+
+        self.storage = storage_class(path)
 
-        return db
+        return Database(self.storage.load())
 
-    def save_db(self):
-        with open("db.p", "wb") as file:
-            pickle.dump(self.db, file)
+    async def save_db(self):
+        """Write whatever changed in the db since last time, if anything.
+
+        Only a snapshot of the changes is taken on the event loop, the
+        writing itself happens in a thread. Flushes never overlap.
+        """
+        async with self.flush_lock:
+            if not self.db.dirty:
+                return
+
+            start = time.perf_counter()
+            dirty = self.db.take_dirty()
+
+            try:
+                snapshot = self.storage.snapshot(self.db, dirty)
+                await asyncio.to_thread(self.storage.write, snapshot)
+            except Exception:
+                self.db.restore_dirty(dirty)
+                raise
+
+            self.last_flush_duration = time.perf_counter() - start
 
     def toast_emoji(self, name):
         emoji_set = self.emoji_ids[name]
@@ -101,19 +169,7 @@ class ToastBot(commands.Bot):
         eventually acts and updates things to the newest state, while
         preventing spam.
         """
-        if times := self.times.get(reference_id):
-            if times["ignore"]:
-                return False
-
-            times["ignore"] = True
-            seconds = datetime.timedelta(seconds=seconds)
-
-            while datetime.datetime.now() - times["time"] < seconds:
-                await asyncio.sleep(0.2)
-
-        self.times[reference_id] = {
-            "time": datetime.datetime.now(), "ignore": False}
-        return True
+        return await self.cooldowns.check(reference_id, seconds)
 
     async def fetch_message_link(self, link):
         """Try to fetch a message from a given link."""
@@ -125,6 +181,11 @@ class ToastBot(commands.Bot):
         if not channel_id or not message_id:
             return None
 
+        key = channel_id, message_id = int(channel_id), int(message_id)
+
+        if message := self.message_cache.get(key):
+            return message
+
         try:
             channel = (
                 self.get_channel(channel_id)
@@ -133,13 +194,84 @@ class ToastBot(commands.Bot):
             return None
 
         try:
-            return await channel.fetch_message(message_id)
+            message = await self.flights.run(
+                ("message", key), partial(channel.fetch_message, message_id))
         except (discord.NotFound, AttributeError):
             return None
 
+        self.message_cache.put(key, message)
+        return message
+
+    async def fetch_channel(self, channel_id):
+        """Fetch a channel, sharing the request with identical ones."""
+        return await self.flights.run(
+            ("channel", channel_id),
+            partial(super().fetch_channel, channel_id))
+
+    async def fetch_user(self, user_id):
+        """Fetch a user, sharing the request with identical ones."""
+        return await self.flights.run(
+            ("user", user_id), partial(super().fetch_user, user_id))
+
+    async def fetch_webhooks(self, channel):
+        """Fetch a channel's webhooks, sharing the request like the above."""
+        return await self.flights.run(
+            ("webhooks", channel.id), channel.webhooks)
+
+    def cached_message(self, payload):
+        key = (payload.channel_id, payload.message_id)
+        return self.message_cache.peek(key)
+
+    @staticmethod
+    def reaction_emoji(emoji):
+        """Return a payload's emoji the way Message.reactions stores it."""
+        return emoji.name if emoji.is_unicode_emoji() else emoji
+
+    async def on_raw_message_edit(self, payload):
+        # Same as discord.py does for the messages in its own cache
+        if message := self.cached_message(payload):
+            message._update(payload.data)
+
+    async def on_raw_message_delete(self, payload):
+        self.message_cache.pop((payload.channel_id, payload.message_id))
+
+    async def on_raw_bulk_message_delete(self, payload):
+        for message_id in payload.message_ids:
+            self.message_cache.pop((payload.channel_id, message_id))
+
+    async def on_raw_reaction_add(self, payload):
+        if message := self.cached_message(payload):
+            emoji = self.reaction_emoji(payload.emoji)
+            message._add_reaction({}, emoji, payload.user_id)
+
+    async def on_raw_reaction_remove(self, payload):
+        if not (message := self.cached_message(payload)):
+            return
+
+        emoji = self.reaction_emoji(payload.emoji)
+
+        try:
+            message._remove_reaction({}, emoji, payload.user_id)
+        except ValueError:  # Counts went out of sync, start over
+            self.message_cache.pop((payload.channel_id, payload.message_id))
+
+    async def on_raw_reaction_clear(self, payload):
+        if message := self.cached_message(payload):
+            message.reactions.clear()
+
+    async def on_raw_reaction_clear_emoji(self, payload):
+        if message := self.cached_message(payload):
+            message._clear_emoji(self.reaction_emoji(payload.emoji))
+
     async def close(self):
-        self.save_db()
+        # Events stop coming in first, so the last save has everything
         await super().close()
+        await self.save_db()
+        self.storage.close()
+        self.image_shrinker.close()
+
+        if self.http_session:
+            await self.http_session.close()
 
 
 if __name__ == "__main__":
@@ -6,7 +6,6 @@ from discord.ext import commands
 from PIL import Image
 import wavelink
 import discord
-import aiohttp
 
 
 class CommandsHidden(commands.Cog):
@@ -20,12 +19,11 @@ class CommandsHidden(commands.Cog):
         if not image_link:
             return None
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(image_link) as resp:
-                if resp.status != 200:
-                    return None
+        async with self.bot.http_session.get(image_link) as resp:
+            if resp.status != 200:
+                return None
 
-                data = BytesIO(await resp.read())
+            data = BytesIO(await resp.read())
 
         image = Image.open(data)
 
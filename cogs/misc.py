@@ -1,7 +1,8 @@
 from contextlib import suppress
+from functools import partial
 from io import BytesIO
 import datetime
-import pickle
+import logging
 
 from discord import app_commands, Interaction
 from discord.ext import commands, tasks
@@ -71,9 +72,12 @@ class Miscellaneous(commands.Cog):
 
     @tasks.loop(minutes=1)
     async def auto_db_save(self):
-        """Save db every minute."""
-        with open("db.p", "wb") as file:
-            pickle.dump(self.bot.db, file)
+        """Save db changes every minute."""
+        # Failed changes are kept, so the next minute tries them again
+        try:
+            await self.bot.save_db()
+        except Exception as e:
+            logging.error(f"Couldn't save the db: {e!r}")
 
     @app_commands.guild_only()
     @app_commands.checks.bot_has_permissions(manage_messages=True)
@@ -93,6 +97,16 @@ class Miscellaneous(commands.Cog):
 
     async def dynamic_voicechannel_update(self, guild: discord.Guild):
         """Update voice channels based on demand."""
+        category_id = self.bot.db["settings"][guild.id]["dynamic_voicechannel"]
+
+        if not category_id:
+            return
+
+        await self.bot.scheduler.submit(
+            f"{guild.id}{category_id}",
+            partial(self.refresh_dynamic_voicechannels, guild), 6)
+
+    async def refresh_dynamic_voicechannels(self, guild: discord.Guild):
         settings = self.bot.db["settings"][guild.id]
         category_id = settings["dynamic_voicechannel"]
         voice_name = settings["dynamic_voicechannel_text"]
@@ -100,8 +114,6 @@ class Miscellaneous(commands.Cog):
 
         if not category_id:
             return
-        if not await self.bot.cooldown_check(f"{guild.id}{category_id}", 6):
-            return
 
         if category_id == "no_category":
             category = guild
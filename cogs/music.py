@@ -1,4 +1,7 @@
+from itertools import accumulate, repeat
 from contextlib import suppress
+from functools import lru_cache
+from bisect import bisect_right
 import datetime
 import asyncio
 from typing import Literal
@@ -20,38 +23,38 @@ def fmt_time(seconds):
     return ":".join([str(t).zfill(2) for t in time])
 
 
+# Horizontal size of characters (aprox.), anything else counts as 7
+CHARACTER_SIZES = {
+    1: "Iijl!,.':| ", 2: 'Jfrt1¨*([])-"', 5: "MW%",
+    3: "BCEFKLPRSTZabcdeghknopqsuvxyz234567890$_+=?/",
+    4: "ADGHNOQUVXYmw@#&"}
+CHARACTER_SIZE = {}
+
+for size, characters in CHARACTER_SIZES.items():
+    for character in characters:
+        CHARACTER_SIZE.setdefault(character, size)
+
+
 def cut(string, length):
     """Cut a string based on the horizontal size of its characters.
 
     Made to prevent song names from breaking into a new line on desktop.
     For Discord's Whitney Book font. Imperfect solution.
     """
-    newstr = ""
-    curlen = 0
-    length *= 5  # input length is the amount of 'size 5' characters
-    size = {1: "Iijl!,.':| ", 2: 'Jfrt1¨*([])-"', 5: "MW%",
-            3: "BCEFKLPRSTZabcdeghknopqsuvxyz234567890$_+=?/",
-            4: "ADGHNOQUVXYmw@#&"}  # horizontal size of characters (aprox.)
-
-    for letter in str(string):
-        for number in size:
-            if letter not in size[number]:
-                continue
+    return cut_string(str(string), length)
 
-            if curlen + number + 5 > length:
-                return newstr + ".."
 
-            newstr += letter
-            curlen += number
-            break
-        else:
-            if curlen + 12 > length:
-                return newstr + ".."
+@lru_cache(maxsize=1024)
+def cut_string(string, length):
+    # The running total of sizes only goes up, so the first character that
+    # doesn't fit (leaving room for the "..") can be found with a bisect
+    sizes = accumulate(map(CHARACTER_SIZE.get, string, repeat(7)))
+    fitting = bisect_right(list(sizes), length * 5 - 5)
 
-            newstr += letter
-            curlen += 7
+    if fitting == len(string):
+        return string
 
-    return newstr
+    return string[:fitting] + ".."
 
 
 class Player(wavelink.Player):
@@ -64,6 +67,8 @@ class Player(wavelink.Player):
 
         self.votes = {"skip": set(), "pause": set(), "leave": set()}
         self.queue_message = None
+        self.queue_wants_new_message = False
+        self.queue_wants_reset_votes = False
         self.info = ""
         self.pending_searches = []
         self.total_played = 0
@@ -151,8 +156,17 @@ class Player(wavelink.Player):
         if not self.queue and not self.queue.history:
             return
 
-        if not await self.bot.cooldown_check(self.channel.id, 2):
-            return
+        # Whichever refresh runs next picks these up, so they're never lost
+        self.queue_wants_new_message |= new_message
+        self.queue_wants_reset_votes |= reset_votes
+
+        await self.bot.scheduler.submit(
+            f"queue{self.channel.id}", self.refresh_queue, 2)
+
+    async def refresh_queue(self):
+        new_message = self.queue_wants_new_message
+        reset_votes = self.queue_wants_reset_votes
+        self.queue_wants_new_message = self.queue_wants_reset_votes = False
 
         if new_message:
             for vote in self.votes.values():
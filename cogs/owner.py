@@ -1,6 +1,7 @@
 from contextlib import redirect_stdout, suppress
 from io import StringIO
 import traceback
+import asyncio
 import textwrap
 import logging
 import sys
@@ -11,6 +12,8 @@ from discord.ext import commands
 import discord
 
 from cogs.embed import EmbedEditorView
+from cogs.starboard import find_original_link
+from utils import TokenBucket
 
 
 class AskView(discord.ui.View):
@@ -170,7 +173,8 @@ class CommandsOwner(commands.Cog):
         embed: str = None,
         invite: bool = False,
         python: str = None,
-        recover_starboard_db: bool = False
+        recover_starboard_db: bool = False,
+        stats: bool = False
     ):
         """Bot owner command 🤔. I can't hide this, blame Discord"""
         if say:
@@ -191,6 +195,8 @@ class CommandsOwner(commands.Cog):
             return await self.python(itx, python)
         if recover_starboard_db:
             return await self.recover_starboard_db(itx)
+        if stats:
+            return await self.stats(itx)
 
     async def say(self, itx: Interaction, words: str):
         """Make toast speak."""
@@ -260,31 +266,85 @@ class CommandsOwner(commands.Cog):
         await view.new_message(itx, code)
 
     async def recover_starboard_db(self, itx: Interaction):
-        """If all goes to shit, recover the ids from starboard posts."""
+        """If all goes to shit, recover the ids from starboard posts.
+
+        Every starboard is read at the same time, sharing a budget of 5
+        requests a second. How far each got is saved as it goes, so if
+        this gets interrupted, running it again carries on from there.
+        """
         await itx.response.defer(ephemeral=True)
 
-        ids_added = 0
+        budget = TokenBucket(rate=5, burst=5)
+        starboards = {
+            self.bot.get_channel(settings.get("starboard_channel"))
+            for settings in self.bot.db["settings"].values()}
+        starboards.discard(None)
 
-        for guild_settings in self.bot.db["settings"].values():
-            starboard = self.bot.get_channel(
-                guild_settings.get("starboard_channel"))
+        recovered = await asyncio.gather(*(
+            self.recover_starboard(starboard, budget)
+            for starboard in starboards))
 
-            if not starboard:
-                continue
+        self.bot.db["recoveries"].clear()
+        await itx.followup.send(f"{sum(recovered)} message IDs added into db")
 
-            async for m in starboard.history(limit=None):
-                if m.author != self.bot.user or not m.embeds:
-                    continue
+    async def recover_starboard(self, starboard, budget: TokenBucket):
+        """Recover the ids from one starboard, return how many were found."""
+        checkpoints = self.bot.db["recoveries"]
+        position = checkpoints.get(starboard.id)
+        recovered = 0
 
-                with suppress(ValueError, IndexError, AttributeError):
-                    embed = m.embeds[0]
-                    og_link = embed.author.url
-                    ids = og_link.split("#")[0].split("/")[-2:]
+        if position == 0:  # Done already
+            return 0
+
+        before = discord.Object(position) if position else None
 
-                    self.bot.db["starboard"][int(ids[1])] = m.id
-                    ids_added += 1
+        while True:
+            await budget.acquire()
+            messages = [
+                m async for m in starboard.history(limit=100, before=before)]
 
-        await itx.followup.send(f"{ids_added} message IDs added into db")
+            if not messages:
+                break
+
+            reverse = {}
+
+            for m in messages:
+                with suppress(ValueError, IndexError, AttributeError):
+                    og_link = find_original_link(m, self.bot.user)
+                    ids = og_link.split("#")[0].split("/")[-2:]
+                    reverse[m.id] = (int(ids[0]), int(ids[1]))
+
+            self.bot.db["starboard"].update(
+                {ids[1]: post_id for post_id, ids in reverse.items()})
+            self.bot.db["starboard_reverse"].update(reverse)
+            recovered += len(reverse)
+
+            before = messages[-1]
+            checkpoints[starboard.id] = before.id
+
+        checkpoints[starboard.id] = 0
+        return recovered
+
+    async def stats(self, itx: Interaction):
+        """Show numbers about the bot's internals, for keeping an eye on."""
+        cache = self.bot.message_cache
+        http = self.bot.http_stats
+        lines = (
+            f"db changes waiting to be saved: {self.bot.db.dirty_count}",
+            f"last db save took: {self.bot.last_flush_duration * 1000:.1f}ms",
+            f"cooldown keys: {len(self.bot.cooldowns)}",
+            f"cached messages: {len(cache)} "
+            f"({cache.hits} hits, {cache.misses} misses)",
+            f"requests shared by single-flight: {self.bot.flights.shared}, "
+            f"remembered as not found: {len(self.bot.flights.not_found)}",
+            f"http requests: {http.requests}, connections made: "
+            f"{http.new_connections}, reused: {http.reused_connections}, "
+            f"dns cache hits: {http.dns_cache_hits}/"
+            f"{http.dns_cache_hits + http.dns_cache_misses}",
+            f"starboard refreshes waiting to be retried: "
+            f"{len(self.bot.db['outbox'])}")
+
+        await itx.response.send_message("\n".join(lines), ephemeral=True)
 
     @owner.autocomplete("restart")
     async def restart_autocomplete(self, itx: Interaction, current: str):
@@ -164,7 +164,12 @@ class StarboardChannelSelect(discord.ui.Select):
 
     async def callback(self, itx: Interaction):
         value = int(self.values[0]) if self.values else None
+        previous = self.view.settings[self.custom_id]
         self.view.settings[self.custom_id] = value
+
+        if previous != value and (cog := itx.client.get_cog("Starboard")):
+            cog.forget_starboard_webhook(previous)
+
         await itx.response.defer()
 
 
@@ -1,18 +1,73 @@
+from collections import defaultdict
 from contextlib import suppress
+from functools import partial
+from typing import Literal
 from io import BytesIO
-
-from discord.ext import commands
+import mimetypes
+import heapq
+import datetime
+import logging
+import asyncio
+import time
+
+from discord import app_commands, Interaction
+from discord.ext import commands, tasks
 from discord import utils
 import discord
 import aiohttp
 import pyfsig
 
+from utils import Leaderboard
+
+
+# Images under this size get downloaded even if over the upload limit,
+# since they might be shrunk to fit
+MAX_IMAGE_SIZE = 50 * 1024 * 1024
+
+# How many times a failed refresh is retried, waiting twice as long each time
+OUTBOX_ATTEMPTS = 10
+
+# How many days messages stay in the starrers ledger, older ones get their
+# stars paged through again if they're starred after that
+STARRERS_DAYS = 14
+
+# How many of the latest weeks and months have their top posts kept
+STATS_WEEKS = 8
+STATS_MONTHS = 12
+
+
+def find_original_link(post: discord.Message, bot_user: discord.User):
+    """Return the jump URL of the message a starboard post is for, or None.
+
+    Old posts are embeds sent by the bot, with the URL as the embed author
+    URL. Current ones are sent by webhook, ending their first line with it.
+    """
+    if post.author == bot_user and post.embeds:
+        return post.embeds[0].author.url
+
+    if post.webhook_id and post.content:
+        for word in reversed(post.content.split("\n")[0].split()):
+            if "/channels/" in word:
+                return word
+
 
 class Starboard(commands.Cog):
     """A system that adds messages voted with stars into a channel."""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.webhooks = {}
+        self.downloads = asyncio.Semaphore(8)
+        self.scanning = {}
+        self.channel_slots = defaultdict(partial(asyncio.Semaphore, 2))
+        self.rescanning = set()
+        self.leaderboards = {}
+        self.retry_outbox.start()
+        self.prune_starrers.start()
+
+    def cog_unload(self):
+        self.retry_outbox.cancel()
+        self.prune_starrers.cancel()
 
     def check_permissions(
         self, channel: discord.TextChannel, *, starboard: bool
@@ -30,14 +85,61 @@ class Starboard(commands.Cog):
             perms.manage_messages, perms.read_messages, perms.send_messages))
 
     async def fetch_starboard_webhook(self, starboard: discord.TextChannel):
+        """Get the starboard webhook, fetching existing one or making one.
+
+        The webhook is kept per channel, with its id and token in the db so
+        it's still known after restarting.
+        """
+        if webhook := self.webhooks.get(starboard.id):
+            return webhook
+
+        if saved := self.bot.db["webhooks"].get(starboard.id):
+            webhook = discord.Webhook.partial(*saved, client=self.bot)
+        else:
+            webhook = await self.find_starboard_webhook(starboard)
+            self.bot.db["webhooks"][starboard.id] = webhook.id, webhook.token
+
+        self.webhooks[starboard.id] = webhook
+        return webhook
+
+    async def find_starboard_webhook(self, starboard: discord.TextChannel):
         """Fetch existing starboard webhook or make one."""
         webhook_name = f"{self.bot.user.name}_starboard_webhook".lower()
-        for webhook in await starboard.webhooks():
+        for webhook in await self.bot.fetch_webhooks(starboard):
             if webhook.name == webhook_name:
                 return webhook
 
         return await starboard.create_webhook(name=webhook_name)
 
+    def forget_starboard_webhook(self, channel_id):
+        self.webhooks.pop(channel_id, None)
+        self.bot.db["webhooks"].pop(channel_id, None)
+
+    async def use_starboard_webhook(self, starboard, func, *args):
+        """Await func(*args, webhook) with the starboard webhook.
+
+        If the known webhook turns out to be deleted, a new one is fetched
+        and func is tried once more. func takes the starboard's channel
+        slot itself, just for its requests, so slow downloads for one post
+        don't hold up the rest of the starboard.
+        """
+        webhook = await self.fetch_starboard_webhook(starboard)
+
+        try:
+            return await func(*args, webhook)
+        except discord.NotFound as e:
+            if e.code != 10015:  # Unknown Webhook
+                raise
+
+        self.forget_starboard_webhook(starboard.id)
+        webhook = await self.fetch_starboard_webhook(starboard)
+        return await func(*args, webhook)
+
+    @commands.Cog.listener()
+    async def on_webhooks_update(self, channel: discord.abc.GuildChannel):
+        if channel.id in self.bot.db["webhooks"]:
+            self.forget_starboard_webhook(channel.id)
+
     async def get_reply_content(self, message: discord.Message):
         if message.type != discord.MessageType.reply:
             return None
@@ -64,55 +166,100 @@ class Starboard(commands.Cog):
         return reply_content
 
     async def prepare_embed(
-        self, embed: discord.Embed, files: list, i: int, filesize_limit: int
+        self, embed: discord.Embed, files: list, i: int, guild: discord.Guild
     ):
-        """Preserve every image as is possible and format embed better."""
-        if embed.image.url:
-            embed.set_image(url=await self.fetch_file(
-                embed.image.url, files, filesize_limit, file_type=f"image{i}"))
-
-        if embed.thumbnail.url:
-            embed.set_thumbnail(url=await self.fetch_file(
-                embed.thumbnail.url, files, filesize_limit,
-                file_type=f"thumbnail{i}"))
-
-        if embed.author.icon_url:
-            author_icon_url = await self.fetch_file(
-                embed.author.icon_url, files, filesize_limit,
-                file_type=f"author{i}")
+        """Preserve every image as is possible and format embed better.
+
+        The images are downloaded at the same time, but added to files in
+        the same order as always.
+        """
+        urls = {
+            "image": embed.image.url,
+            "thumbnail": embed.thumbnail.url,
+            "author": embed.author.icon_url,
+            "footer": embed.footer.icon_url}
+        urls = {k: v for k, v in urls.items() if v}
+        slots = {k: [] for k in urls}
+
+        fetched = dict(zip(urls, await asyncio.gather(*(
+            self.fetch_file(url, slots[k], guild, f"{k}{i}")
+            for k, url in urls.items()))))
+
+        for slot in slots.values():
+            files.extend(slot)
+
+        if "image" in fetched:
+            embed.set_image(url=fetched["image"])
+
+        if "thumbnail" in fetched:
+            embed.set_thumbnail(url=fetched["thumbnail"])
+
+        if "author" in fetched:
             embed.set_author(
                 name=embed.author.name,
-                icon_url=author_icon_url,
+                icon_url=fetched["author"],
                 url=embed.author.url)
 
-        if embed.footer.icon_url:
-            footer_icon_url = await self.fetch_file(
-                embed.footer.icon_url, files, filesize_limit,
-                file_type=f"footer{i}")
-            embed.set_footer(text=embed.footer.text, icon_url=footer_icon_url)
+        if "footer" in fetched:
+            embed.set_footer(
+                text=embed.footer.text, icon_url=fetched["footer"])
 
         # Some sites work around hidden descriptions by putting it in author
         if embed.author.name == embed.description:
             embed.description = ""
 
     async def fetch_file(
-        self, url: str, files: list, filesize_limit: int, file_type: str = ""
+        self, url: str, files: list, guild: discord.Guild, file_type: str = ""
     ):
-        """Add a file to the list of uploaded files, return URL."""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as resp:
-                    if resp.status != 200:
-                        return url
+        """Add a file to the list of uploaded files, return URL.
+
+        Files already in the media cache aren't downloaded again. Images
+        too big to upload get shrunk to fit, if possible.
+        """
+        filesize_limit = guild.filesize_limit
+
+        if cached := await self.bot.media_cache.get(url):
+            data, name, extension = cached
+        else:
+            try:
+                async with self.downloads:
+                    download = await self.download(url, filesize_limit)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return url
+
+            if not download:
+                return url
+
+            data, header, final_url = download
+            name, extension = self.guess_file_name(final_url, header)
+            await self.bot.media_cache.put(url, data, name, extension)
+
+        if len(data) >= filesize_limit:
+            # Cached files can be too big for this guild, not just images
+            if not self.can_shrink(mimetypes.guess_type(f"_.{extension}")[0]):
+                return url
+
+            shrunk = await self.shrink_image(url, data, guild)
 
-                    data = BytesIO(await resp.read())
-        except aiohttp.ClientConnectorError:
-            return url
+            if not shrunk:
+                return url
 
-        if data.getbuffer().nbytes >= filesize_limit:
-            return url
+            data, extension = shrunk, "webp"
 
-        name = resp.url.path.split("/")[-1]
+        if file_type:
+            filename = f"toast_{file_type}.{extension}"
+        else:
+            filename = f"{name}.{extension}"
+
+        files.append(discord.File(BytesIO(data), filename=filename))
+
+        if file_type:
+            return f"attachment://{filename}"
+
+    @staticmethod
+    def guess_file_name(url, header: bytes):
+        """Return the name and extension for a file downloaded from url."""
+        name = url.path.split("/")[-1]
         extension = "unknown"
         expected_formats = (
             "png", "jpg", "jpeg", "webp", "gif", "webm", "mp3", "mp4", "mov")
@@ -121,8 +268,7 @@ class Starboard(commands.Cog):
             name, extension = name.rsplit(".", 1)
 
         if extension.lower() not in expected_formats:
-            signatures = pyfsig.find_matches_for_file_header(data.read(32))
-            data.seek(0)
+            signatures = pyfsig.find_matches_for_file_header(header)
 
             for sig in signatures:
                 if sig.file_extension in expected_formats:
@@ -132,36 +278,204 @@ class Starboard(commands.Cog):
         if extension.lower() == "getblob":  # dumb bluesky stuff
             extension = "mp4"
 
-        if file_type:
-            filename = f"toast_{file_type}.{extension}"
+        return name, extension
+
+    async def download(self, url: str, filesize_limit: int):
+        """Download a file smaller than the limit, without going over it.
+
+        Return the bytes, the first 32 of them (for sniffing the file type)
+        and the URL it ended up at, or None if it didn't work out. Files
+        are streamed in chunks and given up on as soon as they're known to
+        be too big, so at most filesize_limit bytes are ever kept (or
+        MAX_IMAGE_SIZE for images that could be shrunk).
+        """
+        async with self.bot.http_session.get(url) as resp:
+            if resp.status != 200:
+                return None
+
+            # Images over the limit can still be shrunk to fit later
+            if self.can_shrink(resp.content_type):
+                filesize_limit = max(filesize_limit, MAX_IMAGE_SIZE)
+
+            if (resp.content_length or 0) >= filesize_limit:
+                return None
+
+            data = BytesIO()
+            header = b""
+
+            async for chunk in resp.content.iter_chunked(64 * 1024):
+                data.write(chunk)
+
+                if data.tell() >= filesize_limit:
+                    return None
+                if len(header) < 32:
+                    header += chunk[:32 - len(header)]
+
+        return data.getvalue(), header, resp.url
+
+    @staticmethod
+    def can_shrink(content_type):
+        """Return whether files of a content type could be shrunk."""
+        return (
+            bool(content_type)
+            and content_type.startswith("image/")
+            and content_type != "image/gif")
+
+    async def shrink_image(self, url: str, data: bytes, guild: discord.Guild):
+        """Return an image made to fit the guild's limit, None on failure.
+
+        The work happens in the bot's process pool, counting towards the
+        guild's CPU budget. Results are kept in the media cache.
+        """
+        key = f"{url}#fit{guild.filesize_limit}"
+
+        if cached := await self.bot.media_cache.get(key):
+            return cached[0]
+
+        shrunk = await self.bot.image_shrinker.shrink(
+            guild.id, data, guild.filesize_limit)
+
+        if shrunk:
+            await self.bot.media_cache.put(key, shrunk, "", "webp")
+
+        return shrunk
+
+    async def fetch_attachment(
+        self, attachment: discord.Attachment, files: list,
+        guild: discord.Guild
+    ):
+        """Add an attachment to the list of uploaded files.
+
+        Return whether it was added, which only fails for an image that
+        was too big and couldn't be shrunk.
+        """
+        # The query string of attachment URLs changes as they expire
+        url = attachment.url.split("?")[0]
+
+        if cached := await self.bot.media_cache.get(url):
+            data = cached[0]
         else:
-            filename = f"{name}.{extension}"
+            async with self.downloads:
+                data = await attachment.read()
 
-        files.append(discord.File(data, filename=filename))
+            await self.bot.media_cache.put(url, data, attachment.filename, "")
 
-        if file_type:
-            return f"attachment://{filename}"
+        filename = attachment.filename
+
+        if len(data) >= guild.filesize_limit:
+            if not (data := await self.shrink_image(url, data, guild)):
+                return False
+
+            filename = f"{filename.rsplit('.', 1)[0]}.webp"
+
+        files.append(discord.File(
+            BytesIO(data), filename=filename,
+            description=attachment.description,
+            spoiler=attachment.is_spoiler()))
+
+        return True
 
     async def fetch_stars(self, msgs: list):
         """Return star count from both messages with author removed."""
-        reactions = set()
+        starrers = set()
+        author = msgs["original"].author
 
         for message in filter(None, msgs.values()):
+            message_starrers = await self.fetch_starrers(message)
+
+            if author.id in message_starrers:
+                await message.remove_reaction("⭐", author)
+                message_starrers -= {author.id}
+                self.bot.db["starrers"][message.id] = message_starrers
+
+            starrers |= message_starrers
+
+        return len(starrers)
+
+    async def fetch_starrers(self, message: discord.Message):
+        """Return the ids of who starred a message.
+
+        They're kept in the starrers ledger, updated from reaction events.
+        The message's star count is compared with the ledger, and only if
+        they don't match (or the message isn't in there) are its stars
+        paged through again.
+        """
+        starrers = self.bot.db["starrers"].get(message.id)
+        count = sum(r.count for r in message.reactions if r.emoji == "⭐")
+
+        if starrers is not None and len(starrers) == count:
+            return starrers
+
+        return await self.bot.flights.run(
+            ("starrers", message.id), partial(self.scan_starrers, message))
+
+    async def scan_starrers(self, message: discord.Message):
+        """Page through who starred a message, and put it in the ledger."""
+        # Events during the scan may or may not show up in it, so they're
+        # applied again on top of it afterwards
+        self.scanning[message.id] = events = []
+        starrers = set()
+
+        try:
             for reaction in message.reactions:
                 if reaction.emoji == "⭐":
-                    reactions.update([u async for u in reaction.users()])
+                    starrers.update([u.id async for u in reaction.users()])
+        finally:
+            del self.scanning[message.id]
+
+        for added, user_id in events:
+            if added:
+                starrers.add(user_id)
+            else:
+                starrers.discard(user_id)
 
-                    if msgs["original"].author in reactions:
-                        await reaction.remove(msgs["original"].author)
-                        reactions.discard(msgs["original"].author)
+        starrers = frozenset(starrers)
+        self.bot.db["starrers"][message.id] = starrers
+        return starrers
 
-        return len(reactions)
+    def record_star(self, src: discord.RawReactionActionEvent):
+        """Apply a star being added or removed to the ledger."""
+        added = src.event_type == "REACTION_ADD"
+        ledger = self.bot.db["starrers"]
+
+        if src.message_id in self.scanning:
+            self.scanning[src.message_id].append((added, src.user_id))
+
+        if (starrers := ledger.get(src.message_id)) is None:
+            return
+
+        if added:
+            ledger[src.message_id] = starrers | {src.user_id}
+        else:
+            ledger[src.message_id] = starrers - {src.user_id}
+
+    @tasks.loop(hours=1)
+    async def prune_starrers(self):
+        """Drop messages older than STARRERS_DAYS from the starrers ledger.
+
+        Stars mostly come in while a message is new, so this keeps the
+        ledger from growing forever without costing many scans.
+        """
+        ledger = self.bot.db["starrers"]
+        cutoff = utils.time_snowflake(
+            utils.utcnow() - datetime.timedelta(days=STARRERS_DAYS))
+
+        for message_id in [k for k in ledger if k < cutoff]:
+            del ledger[message_id]
 
     async def fetch_both_messages(
         self, reference_msg: discord.Message, starboard: discord.TextChannel
     ):
         """Get original/starboard based off contents from the opposite msg."""
         msgs = {"original": None, "starboard": None}
+        reverse = self.bot.db["starboard_reverse"]
+
+        if reference_msg.channel.id == starboard.id:
+            if original_ids := reverse.get(reference_msg.id):
+                msgs["starboard"] = reference_msg
+                msgs["original"] = await self.bot.fetch_message(*original_ids)
+                return msgs
+
         reference_likely_old_starboard = (
             reference_msg.author == self.bot.user
             and reference_msg.channel.id == starboard.id)
@@ -169,19 +483,14 @@ class Starboard(commands.Cog):
             reference_msg.webhook_id
             and reference_msg.channel.id == starboard.id)
 
-        if reference_likely_old_starboard:
+        if reference_likely_old_starboard or reference_likely_starboard:
             with suppress(ValueError, IndexError):
-                og_link = reference_msg.embeds[0].author.url
+                og_link = find_original_link(reference_msg, self.bot.user)
 
-                msgs["starboard"] = reference_msg
-                msgs["original"] = await self.bot.fetch_message_link(og_link)
-
-        if reference_likely_starboard:
-            with suppress(ValueError, IndexError):
-                og_link = reference_msg.content.split()[5]
-
-                msgs["starboard"] = reference_msg
-                msgs["original"] = await self.bot.fetch_message_link(og_link)
+                if og_link:
+                    msgs["starboard"] = reference_msg
+                    msgs["original"] = await self.bot.fetch_message_link(
+                        og_link)
 
         if not msgs["starboard"]:
             msg_id = (
@@ -192,14 +501,29 @@ class Starboard(commands.Cog):
             msgs["starboard"] = await self.bot.fetch_message(
                 starboard.id, msg_id)
 
+        # Posts from before the reverse index get added as they're seen
+        if msgs["original"] and msgs["starboard"]:
+            if msgs["starboard"].id not in reverse:
+                reverse[msgs["starboard"].id] = (
+                    msgs["original"].channel.id, msgs["original"].id)
+
         return msgs
 
     async def create_message(
-        self, message: discord.Message, stars: int, webhook: discord.Webhook
+        self, starboard: discord.TextChannel, message: discord.Message,
+        stars: int, webhook: discord.Webhook
     ):
-        """Create a message in the starboard."""
+        """Create a message in the starboard.
+
+        Every download for the message runs at the same time. Each one adds
+        its files to its own list in slots, so the order of the files
+        doesn't depend on which download finishes first.
+        """
         content = []
-        files = []
+        slots = []
+        downloads = []
+        embed_videos = []
+        oversized = []
         embeds = []
         potential_embeds = []
         suppress_embeds = False
@@ -221,31 +545,63 @@ class Starboard(commands.Cog):
                 content.append(self.bot.cut(s_message.content, 1700))
 
             for attachment in s_message.attachments:
-                if attachment.size < filesize_limit:
-                    files.append(await attachment.to_file(
-                        spoiler=attachment.is_spoiler()))
-                else:
+                shrinkable = (
+                    self.can_shrink(attachment.content_type)
+                    and attachment.size <= MAX_IMAGE_SIZE)
+
+                if attachment.size >= filesize_limit:
                     content.append(attachment.url)
 
-            for i, embed in enumerate(list(s_message.embeds)):
-                await self.prepare_embed(embed, files, i, filesize_limit)
+                    if not shrinkable:
+                        continue
 
-                if embed.type == "video" and embed.provider.name == "YouTube":
-                    potential_embeds.append(embed)
-                elif embed.video.url:
-                    fetched = await self.fetch_file(
-                        embed.video.url, files, filesize_limit)
-
-                    if fetched != embed.video.url:
-                        # Ensure embed isn't essentially empty
-                        if embed.title or embed.author.name:
-                            embeds.append(embed)
-                        else:
-                            suppress_embeds = True
+                    oversized.append((attachment.url, len(downloads)))
+
+                slots.append(slot := [])
+                downloads.append(
+                    self.fetch_attachment(attachment, slot, message.guild))
+
+            for i, embed in enumerate(list(s_message.embeds)):
+                # The message may be cached and shared, so its embeds are
+                # copied before their images are swapped for attachments
+                embed = discord.Embed.from_dict(embed.to_dict())
+                slots.append(slot := [])
+                downloads.append(
+                    self.prepare_embed(embed, slot, i, message.guild))
+
+                is_youtube = (
+                    embed.type == "video" and embed.provider.name == "YouTube")
+
+                if embed.video.url and not is_youtube:
+                    slots.append(slot := [])
+                    embed_videos.append((embed, len(downloads)))
+                    downloads.append(
+                        self.fetch_file(embed.video.url, slot, message.guild))
+                else:
+                    embed_videos.append((embed, None))
+
+        results = await asyncio.gather(*downloads)
+        files = [file for slot in slots for file in slot]
+
+        # Link big attachments only if they couldn't be shrunk after all
+        for url, download in oversized:
+            if results[download]:
+                content.remove(url)
+
+        for embed, download in embed_videos:
+            if embed.type == "video" and embed.provider.name == "YouTube":
+                potential_embeds.append(embed)
+            elif embed.video.url:
+                if results[download] != embed.video.url:
+                    # Ensure embed isn't essentially empty
+                    if embed.title or embed.author.name:
+                        embeds.append(embed)
                     else:
-                        potential_embeds.append(embed)
+                        suppress_embeds = True
                 else:
-                    embeds.append(embed)
+                    potential_embeds.append(embed)
+            else:
+                embeds.append(embed)
 
         if embeds:
             embeds.extend(potential_embeds)
@@ -257,26 +613,30 @@ class Starboard(commands.Cog):
 
         content = list(filter(None, content))
 
-        sent_webhook = await webhook.send(
-            content=self.bot.cut("\n".join(content), 1998),
-            username=message.author.display_name,
-            avatar_url=message.author.display_avatar.url,
-            files=files,
-            embeds=embeds,
-            suppress_embeds=suppress_embeds,
-            wait=True)
+        async with self.channel_slots[starboard.id]:
+            sent_webhook = await webhook.send(
+                content=self.bot.cut("\n".join(content), 1998),
+                username=message.author.display_name,
+                avatar_url=message.author.display_avatar.url,
+                files=files,
+                embeds=embeds,
+                suppress_embeds=suppress_embeds,
+                wait=True)
 
         self.bot.db["starboard"][message.id] = sent_webhook.id
+        self.bot.db["starboard_reverse"][sent_webhook.id] = (
+            message.channel.id, message.id)
 
     async def edit_message(
         self, message: discord.Message, stars: int, webhook: discord.Webhook
     ):
         """Edit star color and number."""
-        message = await webhook.fetch_message(message.id)
         split_content = message.content.split(" • ")
         split_content[0] = f"-# {stars} {self.bot.toast_emoji('star')}"
 
-        await message.edit(content=" • ".join(split_content))
+        async with self.channel_slots[message.channel.id]:
+            await webhook.edit_message(
+                message.id, content=" • ".join(split_content))
 
     @commands.Cog.listener("on_raw_reaction_add")
     @commands.Cog.listener("on_raw_reaction_remove")
@@ -284,18 +644,107 @@ class Starboard(commands.Cog):
         """Update starboard."""
         if src.emoji.name != "⭐" or not src.guild_id:
             return
+        if not self.bot.db["settings"][src.guild_id]["starboard_channel"]:
+            return
+
+        self.record_star(src)
 
-        settings = self.bot.db["settings"][src.guild_id]
+        # Stars on a post and on its original go through the same refresh,
+        # so changes to either within the cooldown end up as a single edit
+        channel_id, message_id = self.bot.db["starboard_reverse"].get(
+            src.message_id, (src.channel_id, src.message_id))
+        refresh = partial(
+            self.refresh_starboard, src.guild_id, channel_id, message_id)
+
+        await self.bot.scheduler.submit(f"starboard{message_id}", refresh, 6)
+
+    async def refresh_starboard(self, guild_id, channel_id, message_id):
+        """Bring the starboard in line with the message's current stars.
+
+        If that fails in a way that might work later (Discord having
+        issues, rate limits, downloads timing out), it's put in the outbox
+        to be retried.
+        """
+        try:
+            await self.sync_starboard(guild_id, channel_id, message_id)
+        except Exception as e:
+            if not self.is_transient(e):
+                self.bot.db["outbox"].pop(message_id, None)
+                raise
+
+            self.queue_retry(guild_id, channel_id, message_id, e)
+        else:
+            self.bot.db["outbox"].pop(message_id, None)
+
+    @staticmethod
+    def is_transient(error: Exception):
+        """Return whether an error is worth trying again later for."""
+        if isinstance(error, discord.HTTPException):
+            return error.status >= 500 or error.status == 429
+
+        return isinstance(
+            error, (aiohttp.ClientError, asyncio.TimeoutError, OSError))
+
+    def queue_retry(self, guild_id, channel_id, message_id, error):
+        """Put a failed refresh in the outbox, retried with backoff.
+
+        The outbox is keyed by message, so a message is only ever in there
+        once, and retrying a refresh does whatever is needed by then.
+        """
+        outbox = self.bot.db["outbox"]
+        attempts = outbox.get(message_id, {"attempts": 0})["attempts"] + 1
+
+        if attempts > OUTBOX_ATTEMPTS:
+            logging.warning(f"Gave up on starboard for {message_id}: {error}")
+            outbox.pop(message_id, None)
+            return
+
+        delay = min(30 * 2 ** (attempts - 1), 3600)
+        outbox[message_id] = {
+            "guild_id": guild_id, "channel_id": channel_id,
+            "attempts": attempts, "retry_at": time.time() + delay}
+
+        logging.warning(
+            f"Starboard for {message_id} failed ({error!r}), "
+            f"retry {attempts} in {delay}s")
+
+    @tasks.loop(seconds=30)
+    async def retry_outbox(self):
+        """Retry the refreshes in the outbox that are due."""
+        now = time.time()
+        futures = [
+            self.bot.scheduler.submit(
+                f"starboard{message_id}",
+                partial(
+                    self.refresh_starboard, entry["guild_id"],
+                    entry["channel_id"], message_id),
+                6)
+            for message_id, entry in list(self.bot.db["outbox"].items())
+            if entry["retry_at"] <= now]
+
+        for result in await asyncio.gather(*futures, return_exceptions=True):
+            if isinstance(result, Exception):
+                logging.warning(f"Starboard retry failed: {result!r}")
+
+    @retry_outbox.before_loop
+    async def before_retry_outbox(self):
+        await self.bot.wait_until_ready()
+
+    async def sync_starboard(self, guild_id, channel_id, message_id):
+        """Create, edit or delete the message's starboard post as needed."""
+        settings = self.bot.db["settings"][guild_id]
         starboard = self.bot.get_channel(settings["starboard_channel"])
 
         if not starboard:
             return
         if not self.check_permissions(starboard, starboard=True):
             return
-        if not await self.bot.cooldown_check(f"starboard{src.message_id}", 6):
+
+        message = await self.bot.fetch_message(channel_id, message_id)
+
+        if not message:
             return
 
-        message = await self.bot.fetch_message(src.channel_id, src.message_id)
         messages = await self.fetch_both_messages(message, starboard)
         original_msg, starboard_msg = messages.values()
 
@@ -311,8 +760,9 @@ class Starboard(commands.Cog):
             if original_msg.is_system() or stars < starmin:
                 return
 
-            webhook = await self.fetch_starboard_webhook(starboard)
-            await self.create_message(original_msg, stars, webhook)
+            await self.use_starboard_webhook(
+                starboard, self.create_message, starboard, original_msg,
+                stars)
         else:
             if starboard_msg.author == self.bot.user:  # old starboard
                 return
@@ -320,14 +770,357 @@ class Starboard(commands.Cog):
             message_stars = int(starboard_msg.content.split()[1])
 
             if stars == message_stars:
+                self.record_stars(original_msg, stars)
                 return
             # Embed stars being under minimum might mean minimum was changed
             if stars < starmin and (message_stars >= starmin or stars == 0):
-                await starboard_msg.delete()
+                async with self.channel_slots[starboard.id]:
+                    await starboard_msg.delete()
+
+                self.bot.db["starboard_reverse"].pop(starboard_msg.id, None)
+                self.record_stars(original_msg, 0)
                 return
 
-            webhook = await self.fetch_starboard_webhook(starboard)
-            await self.edit_message(starboard_msg, stars, webhook)
+            await self.use_starboard_webhook(
+                starboard, self.edit_message, starboard_msg, stars)
+
+        self.record_stars(original_msg, stars)
+
+    def record_stars(self, message: discord.Message, stars: int):
+        """Bring the guild's star stats in line with a post's stars.
+
+        Only the difference from what was last recorded for the message is
+        applied, to the author and channel totals and to the top posts of
+        the week and month it was sent in.
+        """
+        counts = self.bot.db["star_counts"]
+        previous = counts.get(message.id, 0)
+
+        if stars == previous:
+            return
+
+        if stars:
+            counts[message.id] = stars
+        else:
+            counts.pop(message.id, None)
+
+        guild_id = message.guild.id
+        stats = self.guild_stats(guild_id)
+
+        self.leaderboard(guild_id, "authors").add(
+            message.author.id, stars - previous)
+        self.leaderboard(guild_id, "channels").add(
+            message.channel.id, stars - previous)
+
+        periods = (
+            ("weeks", message.created_at.strftime("%G-W%V"), STATS_WEEKS),
+            ("months", message.created_at.strftime("%Y-%m"), STATS_MONTHS))
+
+        for name, period, kept in periods:
+            posts = stats[name].setdefault(period, {})
+
+            if stars:
+                posts[message.id] = (stars, message.channel.id)
+            else:
+                posts.pop(message.id, None)
+
+            # Period names sort in time order
+            for old_period in sorted(stats[name])[:-kept]:
+                del stats[name][old_period]
+
+        self.bot.db["star_stats"][guild_id] = stats
+
+    def guild_stats(self, guild_id):
+        if guild_id not in self.bot.db["star_stats"]:
+            self.bot.db["star_stats"][guild_id] = {
+                "authors": {}, "channels": {}, "weeks": {}, "months": {}}
+
+        return self.bot.db["star_stats"][guild_id]
+
+    def leaderboard(self, guild_id, name):
+        """Return a sorted view of a guild's author or channel totals."""
+        if (guild_id, name) not in self.leaderboards:
+            scores = self.guild_stats(guild_id)[name]
+            self.leaderboards[guild_id, name] = Leaderboard(scores)
+
+        return self.leaderboards[guild_id, name]
+
+    @app_commands.guild_only()
+    @app_commands.command()
+    async def starboard_stats(
+        self, itx: Interaction,
+        ranking: Literal[
+            "Authors", "Channels", "Posts this week", "Posts this month"
+        ] = "Authors"
+    ):
+        """Show who and what got the most stars in this server.
+
+        :param ranking: What to rank (authors by default)
+        """
+        # Only looked up, guilds get stats once something is starred
+        stats = self.bot.db["star_stats"].get(itx.guild_id)
+        now = discord.utils.utcnow()
+        lines = []
+
+        if not stats:
+            pass
+        elif ranking == "Authors":
+            top = self.leaderboard(itx.guild_id, "authors").top(10)
+            lines = [f"<@{user_id}>: {stars} ⭐" for user_id, stars in top]
+        elif ranking == "Channels":
+            top = self.leaderboard(itx.guild_id, "channels").top(10)
+            lines = [f"<#{channel}>: {stars} ⭐" for channel, stars in top]
+        else:
+            if ranking == "Posts this week":
+                posts = stats["weeks"].get(now.strftime("%G-W%V"), {})
+            else:
+                posts = stats["months"].get(now.strftime("%Y-%m"), {})
+
+            top = heapq.nlargest(10, posts.items(), key=lambda p: p[1][0])
+
+            for message_id, (stars, channel_id) in top:
+                lines.append(
+                    f"https://discord.com/channels/{itx.guild_id}/"
+                    f"{channel_id}/{message_id}: {stars} ⭐")
+
+        description = "\n".join(
+            f"{i}. {line}" for i, line in enumerate(lines, 1))
+
+        embed = discord.Embed(
+            title=f"Starboard stats: {ranking}",
+            description=description or "Nothing starred here yet")
+        await itx.response.send_message(embed=embed)
+
+    @app_commands.default_permissions(manage_guild=True)
+    @app_commands.guild_only()
+    @app_commands.command()
+    async def rescan_starboard(
+        self, itx: Interaction, since: str = None, until: str = None
+    ):
+        """Go through past messages and fix the starboard to match them.
+
+        :param since: Start date, as YYYY-MM-DD (30 days ago by default)
+        :param until: End date, included, as YYYY-MM-DD (today by default)
+        """
+        try:
+            after = self.parse_date(since)
+            before = self.parse_date(until, end=True)
+        except (ValueError, OverflowError):
+            await itx.response.send_message(
+                "Dates should look like 2025-01-31", ephemeral=True)
+            return
+
+        settings = self.bot.db["settings"][itx.guild_id]
+        starboard = itx.guild.get_channel(settings["starboard_channel"])
+
+        if not starboard:
+            await itx.response.send_message(
+                "Set a starboard channel in /settings first", ephemeral=True)
+            return
+        if itx.guild_id in self.rescanning:
+            await itx.response.send_message(
+                "A rescan is already going on in this server", ephemeral=True)
+            return
+
+        await itx.response.send_message(
+            "Starting rescan... If it takes over 15 minutes, the result gets "
+            "posted in this channel", ephemeral=True)
+        self.rescanning.add(itx.guild_id)
+
+        try:
+            await self.rescan(itx, starboard, after, before)
+        finally:
+            self.rescanning.discard(itx.guild_id)
+
+    @staticmethod
+    def parse_date(text, end=False):
+        """Return the UTC midnight a date starts at (or ends at, if end)."""
+        if not text:
+            return None
+
+        date = datetime.date.fromisoformat(text.strip())
+
+        if end:
+            date += datetime.timedelta(1)
+
+        return datetime.datetime.combine(
+            date, datetime.time(), tzinfo=datetime.timezone.utc)
+
+    async def rescan(
+        self, itx: Interaction, starboard: discord.TextChannel,
+        after: datetime.datetime = None, before: datetime.datetime = None
+    ):
+        """Refresh every message in a date range that might need it.
+
+        That's messages with enough stars, and messages that already have
+        a post (which might need fixing or deleting). A few channels are
+        read at a time, and a few refreshes run at a time, which keeps
+        well within rate limits. Without dates, it's the last 30 days.
+
+        Progress is checkpointed in the rescans db section, per channel,
+        so running the same rescan again carries on where it stopped. The
+        checkpoint keeps when the rescan first started, which is what the
+        default dates go from when carrying on.
+        """
+        guild = starboard.guild
+        rescans = self.bot.db["rescans"]
+        span = [d and d.timestamp() for d in (after, before)]
+        checkpoint = rescans.get(guild.id)
+
+        if not checkpoint or checkpoint["span"] != span:
+            checkpoint = {
+                "span": span, "started": utils.utcnow().timestamp(),
+                "channels": {}}
+
+        now = datetime.datetime.fromtimestamp(
+            checkpoint["started"], datetime.timezone.utc)
+        after = after or now - datetime.timedelta(30)
+        before = before or now
+
+        channels = [
+            c for c in guild.text_channels
+            if c != starboard
+            and self.check_permissions(c, starboard=False)
+            and c.permissions_for(guild.me).read_message_history]
+        progress = {
+            "channels": 0, "messages": 0, "refreshed": 0, "failed": 0}
+        channel_slots = asyncio.Semaphore(2)
+        refresh_slots = asyncio.Semaphore(4)
+
+        async def refresh(message):
+            key = f"starboard{message.id}"
+            job = partial(
+                self.refresh_starboard, guild.id, message.channel.id,
+                message.id)
+
+            async with refresh_slots:
+                try:
+                    await self.bot.scheduler.submit(key, job, 6)
+                except Exception as e:
+                    # One message failing shouldn't stop the whole rescan
+                    logging.warning(f"Rescan of {message.id} failed: {e!r}")
+                    progress["failed"] += 1
+                else:
+                    progress["refreshed"] += 1
+
+        def save_position(channel, position):
+            # Saved as a new dict, the one before may be getting written
+            nonlocal checkpoint
+            channels = {**checkpoint["channels"], channel.id: position}
+            checkpoint = {**checkpoint, "channels": channels}
+            rescans[guild.id] = checkpoint
+
+        async def scan(channel):
+            position = checkpoint["channels"].get(channel.id)
+
+            if position == 0:  # Done already
+                progress["channels"] += 1
+                return
+
+            start = discord.Object(position) if position else after
+            refreshes = []
+            read = 0
+
+            async with channel_slots:
+                history = channel.history(
+                    limit=None, after=start, before=before, oldest_first=True)
+
+                try:
+                    async for message in history:
+                        progress["messages"] += 1
+                        read += 1
+
+                        if self.needs_rescan(message):
+                            # Saves the refresh from fetching it again
+                            self.bot.message_cache.put(
+                                (channel.id, message.id), message)
+                            refreshes.append(
+                                asyncio.create_task(refresh(message)))
+
+                        if read % 100 == 0:
+                            await asyncio.gather(*refreshes)
+                            refreshes.clear()
+                            save_position(channel, message.id)
+
+                    await asyncio.gather(*refreshes)
+                finally:
+                    for task in refreshes:
+                        task.cancel()
+
+            save_position(channel, 0)
+            progress["channels"] += 1
+
+        # The interaction can only be edited for 15 minutes, longer rescans
+        # post their result in the channel instead
+        expires_at = time.monotonic() + 14 * 60
+
+        async def report():
+            while time.monotonic() < expires_at:
+                with suppress(discord.HTTPException):
+                    await itx.edit_original_response(content=(
+                        f"Rescanning... {progress['channels']}/"
+                        f"{len(channels)} channels, "
+                        f"{progress['messages']} messages read, "
+                        f"{progress['refreshed']} posts checked"))
+
+                await asyncio.sleep(5)
+
+        reporter = asyncio.create_task(report())
+        scans = [asyncio.create_task(scan(c)) for c in channels]
+
+        try:
+            await asyncio.gather(*scans)
+        except Exception as e:
+            logging.warning(f"Rescan of {guild.id} failed: {e!r}")
+            content = (
+                "Rescan failed, running it again carries on from where it "
+                "stopped")
+        else:
+            rescans.pop(guild.id, None)
+            content = (
+                f"Rescan done: {progress['messages']} messages read in "
+                f"{len(channels)} channels, {progress['refreshed']} "
+                f"posts checked")
+
+            if progress["failed"]:
+                content += f", {progress['failed']} couldn't be fixed"
+        finally:
+            # Nothing is left running once the rescan is over
+            reporter.cancel()
+
+            for task in scans:
+                task.cancel()
+
+            await asyncio.gather(*scans, return_exceptions=True)
+
+        with suppress(discord.HTTPException):
+            if time.monotonic() < expires_at:
+                await itx.edit_original_response(content=content)
+            else:
+                await itx.channel.send(f"{itx.user.mention} {content}")
+
+    def needs_rescan(self, message: discord.Message):
+        settings = self.bot.db["settings"][message.guild.id]
+        stars = sum(r.count for r in message.reactions if r.emoji == "⭐")
+
+        return (
+            stars >= settings["starboard_starmin"]
+            or message.id in self.bot.db["starboard"])
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear(self, src: discord.RawReactionClearEvent):
+        self.bot.db["starrers"].pop(src.message_id, None)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear_emoji(
+        self, src: discord.RawReactionClearEmojiEvent
+    ):
+        if src.emoji.name == "⭐":
+            self.bot.db["starrers"].pop(src.message_id, None)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, src: discord.RawMessageDeleteEvent):
+        self.bot.db["starrers"].pop(src.message_id, None)
 
 
 async def setup(bot):
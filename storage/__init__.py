@@ -0,0 +1,8 @@
+from storage.base import Storage, SECTIONS, NESTED_SECTIONS, INDEX_SECTIONS
+from storage.index import CompactIndex
+from storage.history import MappedHistory, SQLiteHistory, HistoryIndex
+from storage.tracked import TrackedDict, Database
+from storage.journal import Journal
+from storage.files import PickleStorage, load_pickle
+from storage.sqlite import SQLiteStorage
+from storage.migrate import migrate_pickle, import_pickle
@@ -0,0 +1,50 @@
+from contextlib import suppress
+import shutil
+import os
+
+
+def fsync_directory(directory):
+    """Make a rename in the directory survive a crash (where supported)."""
+    with suppress(OSError):
+        fd = os.open(directory or ".", os.O_RDONLY)
+
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def rotate_backups(path, backups):
+    """Shift path.1 to path.2 and so on, then keep the current file as .1."""
+    if not backups or not os.path.exists(path):
+        return
+
+    for i in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+
+    with suppress(FileNotFoundError):
+        os.remove(f"{path}.1")
+
+    try:
+        os.link(path, f"{path}.1")
+    except OSError:
+        shutil.copyfile(path, f"{path}.1")
+
+
+def write_atomic(path, dump, backups=0):
+    """Write a file through a temporary one, then swap it in.
+
+    dump(file) does the writing. A crash at any point leaves either the
+    old or the new file in place, never a half written one.
+    """
+    temp_path = f"{path}.tmp"
+
+    with open(temp_path, "wb") as file:
+        dump(file)
+        file.flush()
+        os.fsync(file.fileno())
+
+    rotate_backups(path, backups)
+    os.replace(temp_path, path)
+    fsync_directory(os.path.dirname(path))
@@ -0,0 +1,37 @@
+SECTIONS = (
+    "settings", "starboard", "old_starboard", "starboard_reverse",
+    "webhooks", "starrers", "outbox", "rescans", "recoveries",
+    "star_counts", "star_stats")
+NESTED_SECTIONS = ("settings",)
+
+# Sections that are int maps, with how many ints each of their values is
+INDEX_SECTIONS = {
+    "starboard": 1, "old_starboard": 1, "starboard_reverse": 2,
+    "star_counts": 1}
+
+
+class Storage:
+    """Somewhere to keep bot.db in between restarts."""
+
+    def load(self):
+        """Return the db as a dict of sections."""
+        raise NotImplementedError
+
+    def save(self, db):
+        """Replace everything stored with the given db."""
+        raise NotImplementedError
+
+    def snapshot(self, db, dirty: dict):
+        """Copy what write() needs for the changed keys of each section.
+
+        Runs on the event loop, so it should be cheap. The db can keep
+        changing while the snapshot is being written.
+        """
+        raise NotImplementedError
+
+    def write(self, snapshot):
+        """Write a snapshot. Runs in a worker thread."""
+        raise NotImplementedError
+
+    def close(self):
+        """Let go of whatever the storage is holding on to."""
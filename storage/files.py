@@ -0,0 +1,124 @@
+import logging
+import pickle
+import os
+
+from storage.atomic import write_atomic
+from storage.base import Storage, SECTIONS, INDEX_SECTIONS
+from storage.history import MappedHistory, HistoryIndex
+from storage.journal import Journal
+
+
+def load_pickle(path):
+    """Load an old single file db.p, sections filled in if missing."""
+    try:
+        with open(path, "rb") as file:
+            db = pickle.load(file)
+    except FileNotFoundError:
+        db = {}
+
+    for section in SECTIONS:
+        db.setdefault(section, {})
+
+    return db
+
+
+class PickleStorage(Storage):
+    """Each section of the db kept in its own file(s) in a directory.
+
+    The starboard maps only ever gain entries, so they're kept as a
+    Journal: a flush appends just the new entries. The journal's snapshot
+    is memory-mapped rather than loaded, only the journal itself is read
+    into RAM. Other sections are pickled again whole when they change,
+    swapped in atomically, with the previous versions kept around as
+    backups in case the newest one can't be read. They're pickled while
+    taking the snapshot, on the event loop, since their values can be
+    dicts that keep being changed in place while the write happens.
+    """
+
+    def __init__(self, directory="db", backups=3):
+        self.directory = directory
+        self.backups = backups
+        os.makedirs(directory, exist_ok=True)
+
+        self.journals = {
+            section: Journal(os.path.join(directory, section), f"<{w + 1}Q")
+            for section, w in INDEX_SECTIONS.items()}
+        self.histories = []
+
+    def section_path(self, section):
+        return os.path.join(self.directory, f"{section}.p")
+
+    def load_section(self, section):
+        path = self.section_path(section)
+        paths = [path] + [f"{path}.{i}" for i in range(1, self.backups + 1)]
+
+        for path in paths:
+            try:
+                with open(path, "rb") as file:
+                    return pickle.load(file)
+            except FileNotFoundError:
+                continue
+            except (pickle.UnpicklingError, EOFError):
+                logging.warning(f"{path} is unreadable, trying a backup")
+
+        return {}
+
+    def load_journaled(self, section):
+        journal = self.journals[section]
+
+        if journal.has_snapshot():
+            history = MappedHistory(journal.snapshot_path, journal.width)
+            self.histories.append(history)
+
+            return HistoryIndex(
+                history, journal.read_journal(), width=journal.width)
+
+        if journal.exists():
+            return journal.load()
+
+        # Sections used to be pickled like the others
+        entries = self.load_section(section)
+        journal.rewrite(entries)
+        return entries
+
+    def load(self):
+        return {
+            section: self.load_journaled(section)
+            if section in self.journals else self.load_section(section)
+            for section in SECTIONS}
+
+    def save(self, db):
+        for section in SECTIONS:
+            entries = dict(db.get(section, {}))
+
+            if section in self.journals:
+                self.journals[section].rewrite(entries)
+            else:
+                self.write_section(section, pickle.dumps(entries))
+
+    def snapshot(self, db, dirty: dict):
+        snapshot = {}
+
+        for section, keys in dirty.items():
+            if section in self.journals:
+                snapshot[section] = {k: db[section].get(k) for k in keys}
+            else:
+                snapshot[section] = pickle.dumps(db[section].copy())
+
+        return snapshot
+
+    def write(self, snapshot):
+        for section, entries in snapshot.items():
+            if section in self.journals:
+                self.journals[section].append(entries)
+            else:
+                self.write_section(section, entries)
+
+    def write_section(self, section, data: bytes):
+        write_atomic(
+            self.section_path(section), lambda file: file.write(data),
+            self.backups)
+
+    def close(self):
+        for history in self.histories:
+            history.close()
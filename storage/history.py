@@ -0,0 +1,185 @@
+from collections.abc import MutableMapping
+import sqlite3
+import struct
+import pickle
+import mmap
+
+from storage.index import CompactIndex
+
+
+class MappedHistory:
+    """A read-only int map over a memory-mapped file of sorted records.
+
+    The file is a Journal snapshot. Nothing is read up front, lookups
+    binary search the records and the OS pages in what they touch.
+    """
+
+    def __init__(self, path, width=1):
+        self.record = struct.Struct(f"<{width + 1}Q")
+        self.width = width
+
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.count = len(self.map) // self.record.size
+
+    def unpack(self, i):
+        return self.record.unpack_from(self.map, i * self.record.size)
+
+    def get(self, key, default=None):
+        low, high = 0, self.count
+
+        while low < high:
+            middle = (low + high) // 2
+            middle_key, *value = self.unpack(middle)
+
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            elif not any(value):
+                return default
+            else:
+                return value[0] if self.width == 1 else tuple(value)
+
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        for key, *value in self.record.iter_unpack(self.map):
+            if any(value):
+                yield key, value[0] if self.width == 1 else tuple(value)
+
+    def close(self):
+        self.map.close()
+
+
+class SQLiteHistory:
+    """A read-only int map looked up row by row in a SQLite table."""
+
+    def __init__(self, path, section):
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        self.section = section
+
+    @staticmethod
+    def decode(value):
+        return pickle.loads(value) if isinstance(value, bytes) else value
+
+    def get(self, key, default=None):
+        row = self.connection.execute(
+            f"SELECT value FROM {self.section} WHERE key = ?",
+            (key,)).fetchone()
+
+        return self.decode(row[0]) if row else default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        query = f"SELECT COUNT(*) FROM {self.section}"
+        return self.connection.execute(query).fetchone()[0]
+
+    def items(self):
+        query = f"SELECT key, value FROM {self.section}"
+
+        for key, value in self.connection.execute(query):
+            yield key, self.decode(value)
+
+    def close(self):
+        self.connection.close()
+
+
+class HistoryIndex(MutableMapping):
+    """An int map whose history stays on disk, with recent changes in RAM.
+
+    Lookups check the recent entries (a CompactIndex) before the history.
+    The history is never written to, removing a key from it is noted in
+    removed instead, and saving takes care of the rest. The history can
+    catch up with the recent changes once they're saved, so the length is
+    counted once and kept up to date rather than worked out from both.
+    """
+
+    def __init__(self, history, recent=(), *, on_change=None, width=1):
+        recent = dict(recent)
+        self.history = history
+        self.removed = {k for k, v in recent.items() if v is None}
+        self.recent = CompactIndex(
+            {k: v for k, v in recent.items() if v is not None},
+            on_change=on_change, width=width)
+
+        self.count = (
+            len(history)
+            - sum(1 for key in self.removed if key in history)
+            + sum(1 for key in self.recent if key not in history))
+
+    @property
+    def on_change(self):
+        return self.recent.on_change
+
+    def __getitem__(self, key):
+        if key in self.recent:
+            return self.recent[key]
+
+        if key not in self.removed:
+            value = self.history.get(key)
+
+            if value is not None:
+                return value
+
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.count += 1
+
+        self.removed.discard(key)
+        self.recent[key] = value
+
+    def __delitem__(self, key):
+        in_history = key not in self.removed and key in self.history
+
+        if key in self.recent:
+            del self.recent[key]
+        elif not in_history:
+            raise KeyError(key)
+
+        if in_history:
+            self.removed.add(key)
+            self.on_change(key)
+
+        self.count -= 1
+
+    def __contains__(self, key):
+        return key in self.recent or (
+            key not in self.removed and key in self.history)
+
+    def __iter__(self):
+        for key, _ in self.items():
+            yield key
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"<HistoryIndex recent={len(self.recent)}>"
+
+    def update(self, *args, **kwargs):
+        entries = dict(*args, **kwargs)
+        self.count += sum(1 for key in entries if key not in self)
+        self.removed.difference_update(entries)
+        self.recent.update(entries)
+
+    def items(self):
+        for key, value in self.history.items():
+            if key not in self.removed and key not in self.recent:
+                yield key, value
+
+        yield from self.recent.items()
+
+    def copy(self):
+        return dict(self.items())
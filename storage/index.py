@@ -0,0 +1,155 @@
+from collections.abc import MutableMapping
+from itertools import chain
+from bisect import bisect_left
+from array import array
+
+
+class CompactIndex(MutableMapping):
+    """An int -> int map kept in two sorted arrays, 16 bytes an entry.
+
+    A dict of Python ints costs around 100 bytes an entry, which adds up
+    with years of starboard history. Lookups bisect the arrays. New keys
+    go into a small dict first, merged into the arrays once it has
+    merge_size of them, so inserting doesn't shift the arrays every time.
+
+    With a width above 1, values are tuples of that many ints instead.
+    Like TrackedDict, on_change(key) is called whenever a key changes.
+    """
+
+    def __init__(
+        self, data=(), *, on_change=None, width=1, merge_size=1024
+    ):
+        self.on_change = on_change or (lambda key: None)
+        self.width = width
+        self.merge_size = merge_size
+        self.buffer = {}
+
+        entries = sorted(dict(data).items())
+        self.key_array = array("Q", [k for k, _ in entries])
+        self.value_array = array("Q")
+
+        for _, value in entries:
+            self.value_array.extend(self.flatten(value))
+
+    def flatten(self, value):
+        return (value,) if self.width == 1 else value
+
+    def value_at(self, i):
+        if self.width == 1:
+            return self.value_array[i]
+
+        return tuple(self.value_array[i * self.width:(i + 1) * self.width])
+
+    def set_value_at(self, i, value):
+        if self.width == 1:
+            self.value_array[i] = value
+        else:
+            start = i * self.width
+            self.value_array[start:start + self.width] = array("Q", value)
+
+    def find(self, key):
+        """Return the index of a key in the arrays, or None."""
+        i = bisect_left(self.key_array, key)
+
+        if i < len(self.key_array) and self.key_array[i] == key:
+            return i
+
+    def merge(self):
+        """Move the buffered entries into the arrays."""
+        if not self.buffer:
+            return
+
+        keys = array("Q")
+        values = array("Q")
+        start = 0
+
+        w = self.width
+
+        for key in sorted(self.buffer):
+            end = bisect_left(self.key_array, key, start)
+            keys.extend(self.key_array[start:end])
+            values.extend(self.value_array[start * w:end * w])
+            keys.append(key)
+            values.extend(self.flatten(self.buffer[key]))
+            start = end
+
+        keys.extend(self.key_array[start:])
+        values.extend(self.value_array[start * w:])
+
+        self.key_array, self.value_array = keys, values
+        self.buffer.clear()
+
+    def __getitem__(self, key):
+        if key in self.buffer:
+            return self.buffer[key]
+
+        i = self.find(key)
+
+        if i is None:
+            raise KeyError(key)
+
+        return self.value_at(i)
+
+    def __setitem__(self, key, value):
+        i = self.find(key)
+
+        if i is not None:
+            self.set_value_at(i, value)
+        else:
+            self.buffer[key] = value
+
+            if len(self.buffer) >= self.merge_size:
+                self.merge()
+
+        self.on_change(key)
+
+    def __delitem__(self, key):
+        if key in self.buffer:
+            del self.buffer[key]
+        elif (i := self.find(key)) is not None:
+            del self.key_array[i]
+            del self.value_array[i * self.width:(i + 1) * self.width]
+        else:
+            raise KeyError(key)
+
+        self.on_change(key)
+
+    def __contains__(self, key):
+        return key in self.buffer or self.find(key) is not None
+
+    def __iter__(self):
+        yield from self.key_array
+        yield from list(self.buffer)
+
+    def __len__(self):
+        return len(self.key_array) + len(self.buffer)
+
+    def __repr__(self):
+        return f"<CompactIndex entries={len(self)}>"
+
+    def update(self, *args, **kwargs):
+        """Set many entries at once, merging only once at the end."""
+        for key, value in dict(*args, **kwargs).items():
+            i = self.find(key)
+
+            if i is not None:
+                self.set_value_at(i, value)
+            else:
+                self.buffer[key] = value
+
+            self.on_change(key)
+
+        if len(self.buffer) >= self.merge_size:
+            self.merge()
+
+    def items(self):
+        if self.width == 1:
+            values = self.value_array
+        else:
+            values = zip(*[iter(self.value_array)] * self.width)
+
+        return chain(
+            zip(self.key_array, values), list(self.buffer.items()))
+
+    def copy(self):
+        return dict(self.items())
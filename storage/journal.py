@@ -0,0 +1,133 @@
+from heapq import merge
+import logging
+import struct
+import os
+
+from storage.atomic import write_atomic
+
+
+class Journal:
+    """An integer map kept as a snapshot file plus an append-only journal.
+
+    Both files are made of fixed-size records: a key followed by its value
+    (a tuple of ints when fmt has more than two fields). New entries only
+    append a record to the journal, which is replayed on top of the
+    snapshot when loading. A record with a value of all zeros removes the
+    key. Once the journal is over compact_size bytes it gets folded into a
+    new, sorted snapshot.
+    """
+
+    def __init__(self, path, fmt="<QQ", compact_size=1024 * 1024):
+        self.record = struct.Struct(fmt)
+        self.width = len(self.record.unpack(bytes(self.record.size))) - 1
+        self.snapshot_path = f"{path}.snapshot"
+        self.journal_path = f"{path}.journal"
+        self.compact_size = compact_size
+
+    def exists(self):
+        return (
+            os.path.exists(self.snapshot_path)
+            or os.path.exists(self.journal_path))
+
+    def pack(self, key, value):
+        if value is None:
+            value = (0,) * self.width
+        elif self.width == 1:
+            value = (value,)
+
+        return self.record.pack(key, *value)
+
+    def read(self, path):
+        """Yield the (key, value) records of a file, None if removed."""
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return
+
+        with file:
+            # A crash while appending can leave a partial record at the end,
+            # which comes out as a short last chunk and gets cut off
+            while chunk := file.read(self.record.size * 4096):
+                usable = len(chunk) - len(chunk) % self.record.size
+
+                for key, *value in self.record.iter_unpack(chunk[:usable]):
+                    if not any(value):
+                        yield key, None
+                    elif self.width == 1:
+                        yield key, value[0]
+                    else:
+                        yield key, tuple(value)
+
+    def has_snapshot(self):
+        return (
+            os.path.exists(self.snapshot_path)
+            and os.path.getsize(self.snapshot_path) > 0)
+
+    def read_journal(self):
+        """Return just the journal's entries, None for removed keys."""
+        return dict(self.read(self.journal_path))
+
+    def load(self):
+        entries = dict(self.read(self.snapshot_path))
+
+        for key, value in self.read(self.journal_path):
+            if value is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = value
+
+        return entries
+
+    def append(self, entries: dict):
+        """Add records for some entries (None to remove) to the journal."""
+        if not entries:
+            return
+
+        with open(self.journal_path, "ab") as file:
+            # Drop a partial record left behind by a crash, if there is one
+            file.truncate(file.tell() - file.tell() % self.record.size)
+            file.write(b"".join(self.pack(k, v) for k, v in entries.items()))
+            file.flush()
+            os.fsync(file.fileno())
+
+        if os.path.getsize(self.journal_path) <= self.compact_size:
+            return
+
+        try:
+            self.compact()
+        except OSError as e:
+            logging.warning(f"Couldn't compact {self.journal_path}: {e}")
+
+    def compact(self):
+        """Fold the journal into the snapshot, and start a fresh journal.
+
+        Both are sorted by key and merged as a stream, so the snapshot is
+        never loaded as a whole.
+        """
+        changes = self.read_journal()
+        snapshot = (
+            (k, v) for k, v in self.read(self.snapshot_path)
+            if k not in changes)
+
+        def dump(file):
+            for key, value in merge(snapshot, sorted(changes.items())):
+                if value is not None:
+                    file.write(self.pack(key, value))
+
+        self.replace_snapshot(dump)
+
+    def rewrite(self, entries: dict):
+        """Replace the snapshot with the given entries."""
+        records = b"".join(self.pack(k, entries[k]) for k in sorted(entries))
+        self.replace_snapshot(lambda file: file.write(records))
+
+    def replace_snapshot(self, dump):
+        """Write a new snapshot with dump(file), then empty the journal.
+
+        The journal is only emptied after the new snapshot is in place, so
+        a crash in between just means replaying records already in it.
+        """
+        write_atomic(self.snapshot_path, dump)
+
+        with open(self.journal_path, "wb") as file:
+            os.fsync(file.fileno())
@@ -0,0 +1,55 @@
+"""Import an old single file db.p into the SQLite storage.
+
+Usage: python -m storage.migrate [db.p] [db.sqlite3]
+"""
+from contextlib import suppress
+import shutil
+import sys
+import os
+
+from storage.atomic import fsync_directory
+from storage.files import load_pickle
+from storage.sqlite import SQLiteStorage
+
+
+def migrate_pickle(pickle_path, storage):
+    """Copy a pickled db into another storage, return the entry count."""
+    db = load_pickle(pickle_path)
+    storage.save(db)
+
+    return sum(len(section) for section in db.values())
+
+
+def import_pickle(pickle_path, path, storage_class=SQLiteStorage):
+    """Create a db at path from a pickled db, return the entry count.
+
+    The import goes into a temporary file (or directory, for files
+    storage) that's only renamed into place once it's complete, so if it
+    fails nothing is left at path and the import happens again next time.
+    """
+    temp_path = f"{path}.import"
+
+    if os.path.isdir(temp_path):
+        shutil.rmtree(temp_path)
+
+    for leftover in (temp_path, f"{temp_path}-wal", f"{temp_path}-shm"):
+        with suppress(FileNotFoundError):
+            os.remove(leftover)
+
+    storage = storage_class(temp_path, backups=0)
+
+    try:
+        entries = migrate_pickle(pickle_path, storage)
+    finally:
+        storage.close()
+
+    os.replace(temp_path, path)
+    fsync_directory(os.path.dirname(path))
+    return entries
+
+
+if __name__ == "__main__":
+    pickle_path, sqlite_path = (sys.argv[1:] + ["db.p", "db.sqlite3"])[:2]
+    entries = import_pickle(pickle_path, sqlite_path)
+
+    print(f"{entries} entries imported from {pickle_path} to {sqlite_path}")
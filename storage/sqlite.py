@@ -0,0 +1,125 @@
+import sqlite3
+import pickle
+import time
+import os
+
+from storage.atomic import rotate_backups
+from storage.base import Storage, SECTIONS, INDEX_SECTIONS
+from storage.history import SQLiteHistory, HistoryIndex
+from storage.tracked import TrackedDict
+
+
+class SQLiteStorage(Storage):
+    """Every db entry as its own row, so a change is a single upsert.
+
+    Each section is a table of key/value rows. Integers are kept as they
+    are, anything else (like a guild's settings) is pickled. Every write
+    is one transaction; a copy of the whole db is rotated into backups at
+    most once every backup_interval seconds.
+
+    The starboard maps aren't loaded at all, they're looked up in their
+    tables as needed, with only the changes since startup kept in RAM.
+    """
+
+    def __init__(self, path="db.sqlite3", backups=3, backup_interval=3600):
+        self.path = path
+        self.backups = backups
+        self.backup_interval = backup_interval
+        self.backed_up_at = time.monotonic()
+        self.histories = []
+
+        # Writes happen in a worker thread, one at a time
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=FULL")
+
+        with self.connection:
+            for section in SECTIONS:
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {section} "
+                    f"(key INTEGER PRIMARY KEY, value)")
+
+    @staticmethod
+    def encode(value):
+        if type(value) is int:
+            return value
+        if isinstance(value, TrackedDict):
+            value = value.copy()
+
+        return pickle.dumps(value)
+
+    @staticmethod
+    def decode(value):
+        return pickle.loads(value) if isinstance(value, bytes) else value
+
+    def load(self):
+        db = {}
+
+        for section in SECTIONS:
+            if section in INDEX_SECTIONS:
+                history = SQLiteHistory(self.path, section)
+                self.histories.append(history)
+                db[section] = HistoryIndex(
+                    history, width=INDEX_SECTIONS[section])
+                continue
+
+            rows = self.connection.execute(f"SELECT key, value FROM {section}")
+            db[section] = {k: self.decode(v) for k, v in rows}
+
+        return db
+
+    def save(self, db):
+        with self.connection:
+            for section in SECTIONS:
+                self.connection.execute(f"DELETE FROM {section}")
+                self._upsert(section, db.get(section, {}))
+
+    def snapshot(self, db, dirty: dict):
+        snapshot = {}
+
+        for section, keys in dirty.items():
+            entries = db[section]
+            changed = {
+                k: self.encode(entries[k]) for k in keys if k in entries}
+            removed = [k for k in keys if k not in entries]
+            snapshot[section] = changed, removed
+
+        return snapshot
+
+    def write(self, snapshot):
+        with self.connection:
+            for section, (changed, removed) in snapshot.items():
+                self._upsert(section, changed, encode=False)
+                self.connection.executemany(
+                    f"DELETE FROM {section} WHERE key = ?",
+                    [(k,) for k in removed])
+
+        if time.monotonic() - self.backed_up_at >= self.backup_interval:
+            self.backup()
+
+    def backup(self):
+        """Rotate a consistent copy of the db into the backups."""
+        if not self.backups:
+            return
+
+        temp_path = f"{self.path}.tmp"
+        destination = sqlite3.connect(temp_path)
+
+        with destination:
+            self.connection.backup(destination)
+
+        destination.close()
+        rotate_backups(f"{self.path}.bak", self.backups - 1)
+        os.replace(temp_path, f"{self.path}.bak")
+        self.backed_up_at = time.monotonic()
+
+    def _upsert(self, section, entries: dict, encode=True):
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO {section} (key, value) VALUES (?, ?)",
+            [(k, self.encode(v) if encode else v) for k, v in entries.items()])
+
+    def close(self):
+        for history in self.histories:
+            history.close()
+
+        self.connection.close()
@@ -0,0 +1,117 @@
+from functools import partial
+
+from storage.base import NESTED_SECTIONS, INDEX_SECTIONS
+from storage.history import HistoryIndex
+from storage.index import CompactIndex
+
+
+class TrackedDict(dict):
+    """A dict that calls on_change(key) whenever one of its keys changes.
+
+    If nested, dicts stored in it are tracked too, and a change inside of
+    them counts as a change to the key they're stored in.
+    """
+
+    def __init__(self, data=(), *, on_change, nested=False):
+        super().__init__()
+        self.on_change = on_change
+        self.nested = nested
+
+        for key, value in dict(data).items():
+            super().__setitem__(key, self.wrap(key, value))
+
+    def wrap(self, key, value):
+        if not self.nested or not isinstance(value, dict):
+            return value
+
+        return TrackedDict(value, on_change=lambda _: self.on_change(key))
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, self.wrap(key, value))
+        self.on_change(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.on_change(key)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def pop(self, key, *default):
+        if key not in self:
+            return super().pop(key, *default)
+
+        value = super().pop(key)
+        self.on_change(key)
+        return value
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.on_change(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        keys = list(self)
+        super().clear()
+
+        for key in keys:
+            self.on_change(key)
+
+    def copy(self):
+        """Return a plain dict copy, nested dicts included."""
+        if not self.nested:
+            return dict(self)
+
+        return {
+            k: v.copy() if isinstance(v, TrackedDict) else v
+            for k, v in self.items()}
+
+
+class Database(dict):
+    """bot.db, keeping note of what changed since it was last flushed."""
+
+    def __init__(self, sections: dict):
+        super().__init__()
+        self.dirty = {}
+
+        for name, entries in sections.items():
+            on_change = partial(self.mark, name)
+
+            if isinstance(entries, HistoryIndex):
+                entries.recent.on_change = on_change
+                self[name] = entries
+            elif name in INDEX_SECTIONS:
+                self[name] = CompactIndex(
+                    entries, on_change=on_change, width=INDEX_SECTIONS[name])
+            else:
+                self[name] = TrackedDict(
+                    entries, on_change=on_change,
+                    nested=name in NESTED_SECTIONS)
+
+    def mark(self, section, key):
+        self.dirty.setdefault(section, set()).add(key)
+
+    @property
+    def dirty_count(self):
+        return sum(len(keys) for keys in self.dirty.values())
+
+    def take_dirty(self):
+        """Return what changed by section, and start tracking anew."""
+        dirty, self.dirty = self.dirty, {}
+        return dirty
+
+    def restore_dirty(self, dirty: dict):
+        """Put back changes taken with take_dirty that failed to be saved."""
+        for section, keys in dirty.items():
+            self.dirty.setdefault(section, set()).update(keys)
@@ -0,0 +1,61 @@
+"""Compare CompactIndex with a plain dict, for memory and lookup time.
+
+Run from the repository root with: python -m tests.bench_compact_index
+"""
+from array import array
+import tracemalloc
+import random
+import timeit
+
+from storage.index import CompactIndex
+
+ENTRIES = 500_000
+LOOKUPS = 100_000
+NEW_KEYS = 10_000
+
+
+def snowflakes(count):
+    """Return random ids the size of Discord snowflakes, as an array."""
+    return array("Q", (random.getrandbits(60) for _ in range(count)))
+
+
+def measure(build):
+    """Return what build() returns and the bytes it still holds on to."""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    random.seed(0)
+    keys, values = snowflakes(ENTRIES), snowflakes(ENTRIES)
+    lookups = random.sample(list(keys), LOOKUPS)
+
+    mappings = {
+        "dict": lambda: dict(zip(keys, values)),
+        "CompactIndex": lambda: CompactIndex(zip(keys, values))}
+
+    for name, build in mappings.items():
+        mapping, size = measure(build)
+        seconds = timeit.timeit(
+            lambda: [mapping[key] for key in lookups], number=1)
+
+        print(
+            f"{name:>12}: {size / 1024 / 1024:5.1f} MB, "
+            f"{seconds / LOOKUPS * 1e6:.2f} us per lookup")
+
+    index = CompactIndex(zip(keys, values))
+    new_keys = snowflakes(NEW_KEYS)
+
+    def insert():
+        for key in new_keys:
+            index[key] = key
+
+    seconds = timeit.timeit(insert, number=1)
+    print(f"{NEW_KEYS} new keys into the index: {seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Time music.cut against the old character by character loop.
+
+Run from the repository root with: python -m tests.bench_music_cut
+"""
+import random
+import timeit
+
+from cogs.music import cut, cut_string
+from tests.test_music_cut import ALPHABET, old_cut
+
+CALLS = 5000
+
+
+def main():
+    random.seed(0)
+    titles = ["".join(random.choices(ALPHABET, k=60)) for _ in range(8)]
+    calls = CALLS * len(titles)
+
+    def uncached():
+        cut_string.cache_clear()
+        return [cut(title, 29) for title in titles]
+
+    timings = {
+        "old": lambda: [old_cut(title, 29) for title in titles],
+        "uncached": uncached,
+        "cached": lambda: [cut(title, 29) for title in titles]}
+
+    for name, run in timings.items():
+        seconds = timeit.timeit(run, number=CALLS)
+        print(f"{name:>8}: {seconds / calls * 1e6:.2f} us per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Time creating a starboard post whose media comes from a slow server.
+
+A local aiohttp server stands in for Discord's CDN and link embeds,
+answering every request after DELAY seconds. The post has 4 attachments
+and 2 embeds with 4 images each. It's made once with downloads one at a
+time, as they used to be, and once with the starboard's own limit.
+
+Run from the repository root with: python -m tests.bench_starboard_downloads
+"""
+from types import SimpleNamespace
+import tempfile
+import asyncio
+import time
+
+from aiohttp import web
+import discord
+
+from cogs.starboard import Starboard
+from utils import HTTPStats, MediaCache, create_session
+
+DELAY = 0.1
+PORT = 8766
+BASE_URL = f"http://127.0.0.1:{PORT}"
+IMAGE = b"\x89PNG\r\n\x1a\n" + bytes(20000)
+
+
+async def serve_image(request):
+    await asyncio.sleep(DELAY)
+    return web.Response(body=IMAGE, content_type="image/png")
+
+
+class Attachment:
+    """Enough of a discord.Attachment, read from the stand-in server."""
+
+    def __init__(self, session, i):
+        self.session = session
+        self.url = f"{BASE_URL}/attachment{i}.png"
+        self.filename = f"attachment{i}.png"
+        self.size = len(IMAGE)
+        self.content_type = "image/png"
+        self.description = None
+
+    def is_spoiler(self):
+        return False
+
+    async def read(self):
+        async with self.session.get(self.url) as resp:
+            return await resp.read()
+
+
+def make_embed(i):
+    embed = discord.Embed(title=f"Embed {i}")
+    embed.set_image(url=f"{BASE_URL}/image{i}.png")
+    embed.set_thumbnail(url=f"{BASE_URL}/thumbnail{i}.png")
+    embed.set_author(name="Author", icon_url=f"{BASE_URL}/author{i}.png")
+    embed.set_footer(text="Footer", icon_url=f"{BASE_URL}/footer{i}.png")
+    return embed
+
+
+async def create_post(session, downloads):
+    """Return how long creating the post took, and its file names."""
+    sent = {}
+
+    async def send(**kwargs):
+        sent.update(kwargs)
+        return SimpleNamespace(id=1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        bot = SimpleNamespace(
+            db={"starboard": {}, "starboard_reverse": {}, "starrers": {}},
+            http_session=session, media_cache=MediaCache(directory),
+            toast_emoji=lambda name: name, cut=lambda text, n: text[:n],
+            wait_until_ready=asyncio.Event().wait)
+        starboard = Starboard(bot)
+        starboard.downloads = asyncio.Semaphore(downloads)
+
+        guild = SimpleNamespace(id=1, filesize_limit=10 * 1024 * 1024)
+        user = SimpleNamespace(
+            name="user", display_name="User",
+            display_avatar=SimpleNamespace(url=f"{BASE_URL}/avatar.png"))
+        message = SimpleNamespace(
+            id=2, guild=guild, author=user, channel=SimpleNamespace(id=3),
+            jump_url="https://discord.com/channels/1/3/2", content="Hi",
+            type=discord.MessageType.default, message_snapshots=[],
+            attachments=[Attachment(session, i) for i in range(4)],
+            embeds=[make_embed(i) for i in range(2)])
+
+        start = time.perf_counter()
+        await starboard.create_message(
+            SimpleNamespace(id=4), message, 5, SimpleNamespace(send=send))
+        seconds = time.perf_counter() - start
+        starboard.cog_unload()
+
+    return seconds, [file.filename for file in sent["files"]]
+
+
+async def main():
+    app = web.Application()
+    app.router.add_get("/{name}", serve_image)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+    session = create_session(HTTPStats())
+
+    try:
+        one_at_a_time, files = await create_post(session, 1)
+        concurrent, concurrent_files = await create_post(session, 8)
+    finally:
+        await session.close()
+        await runner.cleanup()
+
+    print(f"One download at a time: {one_at_a_time:.2f} s")
+    print(f"Concurrent downloads: {concurrent:.2f} s")
+    print(f"Same files in the same order: {files == concurrent_files}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
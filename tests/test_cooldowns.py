@@ -0,0 +1,114 @@
+import asyncio
+
+from utils.cooldowns import Cooldowns
+
+SECONDS = 0.1
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_first_use_is_immediate():
+    async def main():
+        cooldowns = Cooldowns()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        assert await cooldowns.check("key", SECONDS)
+        assert loop.time() - start < SECONDS / 2
+
+    run(main())
+
+
+def test_second_use_waits_for_the_cooldown():
+    async def main():
+        cooldowns = Cooldowns()
+        loop = asyncio.get_running_loop()
+
+        await cooldowns.check("key", SECONDS)
+        start = loop.time()
+
+        assert await cooldowns.check("key", SECONDS)
+        assert loop.time() - start >= SECONDS * 0.9
+
+    run(main())
+
+
+def test_third_use_is_refused_while_one_waits():
+    async def main():
+        cooldowns = Cooldowns()
+
+        await cooldowns.check("key", SECONDS)
+        second = asyncio.create_task(cooldowns.check("key", SECONDS))
+        await asyncio.sleep(0)
+
+        assert not await cooldowns.check("key", SECONDS)
+        assert await second
+
+    run(main())
+
+
+def test_other_keys_are_independent():
+    async def main():
+        cooldowns = Cooldowns()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        assert await cooldowns.check("a", SECONDS)
+        assert await cooldowns.check("b", SECONDS)
+        assert loop.time() - start < SECONDS / 2
+
+    run(main())
+
+
+def test_cancelled_waiter_releases_the_key():
+    async def main():
+        cooldowns = Cooldowns()
+
+        await cooldowns.check("key", SECONDS)
+        second = asyncio.create_task(cooldowns.check("key", SECONDS))
+        await asyncio.sleep(0)
+
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+
+        assert second.cancelled()
+        assert await cooldowns.check("key", SECONDS)
+
+    run(main())
+
+
+def test_keys_expire_once_the_cooldown_passes():
+    async def main():
+        cooldowns = Cooldowns(tick_size=SECONDS / 4)
+
+        await cooldowns.check("a", SECONDS)
+        await cooldowns.check("b", SECONDS * 3)
+        assert len(cooldowns) == 2
+
+        await asyncio.sleep(SECONDS * 2)
+        assert len(cooldowns) == 1
+
+        await asyncio.sleep(SECONDS * 2)
+        assert len(cooldowns) == 0
+        assert not cooldowns.wheel
+
+    run(main())
+
+
+def test_waiting_keys_do_not_expire():
+    async def main():
+        cooldowns = Cooldowns(tick_size=SECONDS / 4)
+
+        await cooldowns.check("key", SECONDS)
+        waiting = asyncio.create_task(cooldowns.check("key", SECONDS))
+        await asyncio.sleep(SECONDS * 1.5)
+
+        assert await waiting
+        assert len(cooldowns) == 1
+
+        await asyncio.sleep(SECONDS * 1.5)
+        assert len(cooldowns) == 0
+
+    run(main())
@@ -0,0 +1,59 @@
+import random
+import string
+
+from cogs.music import cut
+
+LENGTHS = (0, 1, 5, 23, 29, 40, 100)
+ALPHABET = string.printable + "¨éü日本語🎵—–"
+
+
+def old_cut(string, length):
+    """cut as it was before the size table, to check against."""
+    newstr = ""
+    curlen = 0
+    length *= 5  # input length is the amount of 'size 5' characters
+    size = {1: "Iijl!,.':| ", 2: 'Jfrt1¨*([])-"', 5: "MW%",
+            3: "BCEFKLPRSTZabcdeghknopqsuvxyz234567890$_+=?/",
+            4: "ADGHNOQUVXYmw@#&"}  # horizontal size of characters (aprox.)
+
+    for letter in str(string):
+        for number in size:
+            if letter not in size[number]:
+                continue
+
+            if curlen + number + 5 > length:
+                return newstr + ".."
+
+            newstr += letter
+            curlen += number
+            break
+        else:
+            if curlen + 12 > length:
+                return newstr + ".."
+
+            newstr += letter
+            curlen += 7
+
+    return newstr
+
+
+def test_matches_old_cut():
+    rng = random.Random(1)
+    titles = [
+        "".join(rng.choices(ALPHABET, k=rng.randint(0, 120)))
+        for _ in range(20000)]
+
+    for title in titles:
+        for length in LENGTHS:
+            assert cut(title, length) == old_cut(title, length), title
+
+
+def test_matches_old_cut_for_non_strings():
+    for value in (None, 0, 12345678901234567890, 1.5):
+        for length in LENGTHS:
+            assert cut(value, length) == old_cut(value, length)
+
+
+def test_fitting_titles_are_left_alone():
+    assert cut("Never Gonna Give You Up", 29) == "Never Gonna Give You Up"
+    assert cut("MMMMMMMMMM", 5) == "MMMM.."
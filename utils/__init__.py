@@ -0,0 +1,9 @@
+from utils.cooldowns import Cooldowns
+from utils.scheduler import RefreshScheduler
+from utils.cache import LRUCache
+from utils.singleflight import SingleFlight
+from utils.http import HTTPStats, create_session
+from utils.media_cache import MediaCache
+from utils.images import ImageShrinker
+from utils.ratelimit import TokenBucket
+from utils.leaderboard import Leaderboard
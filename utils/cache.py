@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """A bounded cache that forgets the least recently used keys first."""
+
+    def __init__(self, maxsize=1024):
+        self.entries = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def peek(self, key, default=None):
+        """Get a key without counting it as a use."""
+        return self.entries.get(key, default)
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self.entries.pop(key, default)
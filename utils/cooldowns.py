@@ -0,0 +1,102 @@
+import asyncio
+import math
+
+
+def wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Cooldowns:
+    """Approve only 1 use of a key every so many seconds.
+
+    - A key is used with a 5 second cooldown: Returns True
+    - 2nd use 1s later: Waits until the 4 seconds pass, then returns True
+    - 3rd use 1s later: Returns False, the 2nd is already waiting
+
+    The one waiting use sleeps on a future that a loop.call_at timer
+    resolves when the cooldown ends, so nothing wakes up in the meantime.
+    Times come from the loop's monotonic clock.
+
+    Keys are dropped once their cooldown has passed and nothing is waiting
+    on them, which behaves the same as keeping them. To find them without
+    scanning every key, each is put in the slot of an expiry wheel for the
+    tick (of tick_size seconds) its cooldown ends in, and a single timer
+    clears out slots as their tick comes.
+    """
+
+    def __init__(self, tick_size=1.0):
+        self.entries = {}
+        self.wheel = {}
+        self.tick_size = tick_size
+        self.timer = None
+        self.timer_tick = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    async def check(self, key, seconds):
+        entry = self.entries.get(key)
+
+        if entry and entry["waiter"]:
+            return False
+
+        await self.wait(key, seconds)
+        return True
+
+    async def wait(self, key, seconds):
+        """Wait until the key's cooldown has passed, then use the key.
+
+        Unlike check(), this never refuses, so only one thing should be
+        waiting on a key at a time.
+        """
+        loop = asyncio.get_running_loop()
+
+        if entry := self.entries.get(key):
+            ready_at = entry["used_at"] + seconds
+
+            if ready_at > loop.time():
+                entry["waiter"] = loop.create_future()
+                timer = loop.call_at(ready_at, wake, entry["waiter"])
+
+                try:
+                    await entry["waiter"]
+                finally:
+                    timer.cancel()
+                    entry["waiter"] = None
+
+        now = loop.time()
+        self.entries[key] = {
+            "used_at": now, "expires_at": now + seconds, "waiter": None}
+        self.add_to_wheel(loop, key, now + seconds)
+
+    def add_to_wheel(self, loop, key, expires_at):
+        tick = math.ceil(expires_at / self.tick_size)
+        self.wheel.setdefault(tick, set()).add(key)
+
+        if not self.timer or tick < self.timer_tick:
+            self.schedule(loop, tick)
+
+    def schedule(self, loop, tick):
+        if self.timer:
+            self.timer.cancel()
+
+        self.timer_tick = tick
+        self.timer = loop.call_at(tick * self.tick_size, self.expire, loop)
+
+    def expire(self, loop):
+        """Drop keys whose cooldown has passed, from every slot that's due."""
+        self.timer = None
+        now = loop.time()
+
+        for tick in [t for t in self.wheel if t * self.tick_size <= now]:
+            for key in self.wheel.pop(tick):
+                entry = self.entries.get(key)
+
+                # Keys used again since are in a later slot as well
+                if entry and not entry["waiter"]:
+                    if entry["expires_at"] <= now:
+                        del self.entries[key]
+
+        if self.wheel:
+            self.schedule(loop, min(self.wheel))
@@ -0,0 +1,45 @@
+import aiohttp
+
+
+class HTTPStats:
+    """Counts of what a session and its connection pool have been doing."""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_start.append(self.counter("requests"))
+        self.trace_config.on_connection_create_end.append(
+            self.counter("new_connections"))
+        self.trace_config.on_connection_reuseconn.append(
+            self.counter("reused_connections"))
+        self.trace_config.on_dns_cache_hit.append(
+            self.counter("dns_cache_hits"))
+        self.trace_config.on_dns_cache_miss.append(
+            self.counter("dns_cache_misses"))
+
+    def counter(self, name):
+        async def count(session, context, params):
+            setattr(self, name, getattr(self, name) + 1)
+
+        return count
+
+
+def create_session(stats: HTTPStats):
+    """Return the session for everything the bot downloads.
+
+    Connections are kept alive and reused, with a cap per host so one slow
+    site can't take the whole pool, and DNS lookups are cached. Reads that
+    stall for half a minute are given up on.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=64, limit_per_host=8, ttl_dns_cache=300, keepalive_timeout=60)
+    timeout = aiohttp.ClientTimeout(total=300, sock_connect=10, sock_read=30)
+
+    return aiohttp.ClientSession(
+        connector=connector, timeout=timeout,
+        trace_configs=[stats.trace_config])
@@ -0,0 +1,108 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from io import BytesIO
+import multiprocessing
+import asyncio
+import time
+
+from PIL import Image, ImageOps
+
+
+def shrink_image(data: bytes, limit: int):
+    """Re-encode an image as WebP, downscaling until it's under limit bytes.
+
+    Meant to run in a worker process. Return the new image data (None if
+    it can't be done) and how much CPU time it took.
+    """
+    start = time.process_time()
+
+    try:
+        image = Image.open(BytesIO(data))
+
+        if getattr(image, "is_animated", False):
+            return None, time.process_time() - start
+
+        image = ImageOps.exif_transpose(image)
+
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.mode else "RGB")
+
+        for _ in range(8):
+            output = BytesIO()
+            image.save(output, format="webp", quality=85)
+
+            if output.tell() < limit:
+                return output.getvalue(), time.process_time() - start
+
+            # Size goes roughly with the area, aim a bit under the limit
+            scale = min(0.9, (limit / output.tell()) ** 0.5 * 0.9)
+            size = (
+                max(1, int(image.width * scale)),
+                max(1, int(image.height * scale)))
+            image = image.resize(size, Image.Resampling.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        pass
+
+    return None, time.process_time() - start
+
+
+class ImageShrinker:
+    """Shrink images in a process pool, with a CPU budget per guild.
+
+    A guild can use up to budget seconds of CPU time every window seconds,
+    past that its images are left as they are until the window moves on,
+    so a burst of stars in one guild can't keep the host busy. A job's
+    cost isn't known until it's done, so an estimate (the average of past
+    jobs) is counted against the budget while it runs, and replaced with
+    the real cost after.
+    """
+
+    def __init__(self, workers=2, budget=20.0, window=300.0):
+        # Forking the bot's process while its threads run isn't safe
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("forkserver"))
+        self.budget = budget
+        self.window = window
+        self.spent = {}
+        self.shrunk = 0
+        self.estimate = 1.0
+
+    def spent_by(self, guild_id):
+        """Return the CPU seconds a guild used in the current window."""
+        spent = self.spent.get(guild_id)
+
+        if not spent:
+            return 0.0
+
+        while spent and spent[0][0] < time.monotonic() - self.window:
+            spent.popleft()
+
+        if not spent:
+            del self.spent[guild_id]
+
+        return sum(seconds for _, seconds in spent)
+
+    async def shrink(self, guild_id, data: bytes, limit: int):
+        """Return data shrunk under limit bytes, or None if it can't be."""
+        if self.spent_by(guild_id) + self.estimate > self.budget:
+            return None
+
+        # Reserved before running, so jobs started together all count
+        cost = [time.monotonic(), self.estimate]
+        self.spent.setdefault(guild_id, deque()).append(cost)
+
+        loop = asyncio.get_running_loop()
+        shrunk, seconds = await loop.run_in_executor(
+            self.executor, shrink_image, data, limit)
+
+        cost[1] = seconds
+        self.estimate = self.estimate * 0.9 + seconds * 0.1
+
+        if shrunk:
+            self.shrunk += 1
+
+        return shrunk
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
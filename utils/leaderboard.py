@@ -0,0 +1,36 @@
+from bisect import bisect_left, insort
+
+
+class Leaderboard:
+    """Scores by key, kept in order so the top k can be read in O(k).
+
+    scores is the dict the scores are kept in, and is changed in place.
+    Changing a score is a bisect and a list insertion.
+    """
+
+    def __init__(self, scores: dict):
+        self.scores = scores
+        self.ranking = sorted((-score, key) for key, score in scores.items())
+
+    def __len__(self):
+        return len(self.ranking)
+
+    def add(self, key, amount):
+        """Add to a key's score, dropping the key once it's at 0."""
+        if key in self.scores:
+            score = self.scores[key]
+            del self.ranking[bisect_left(self.ranking, (-score, key))]
+        else:
+            score = 0
+
+        score += amount
+
+        if score > 0:
+            self.scores[key] = score
+            insort(self.ranking, (-score, key))
+        else:
+            self.scores.pop(key, None)
+
+    def top(self, k):
+        """Return the k best (key, score) pairs, best first."""
+        return [(key, -score) for score, key in self.ranking[:k]]
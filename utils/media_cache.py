@@ -0,0 +1,204 @@
+from collections import OrderedDict
+from contextlib import suppress
+import tempfile
+import hashlib
+import asyncio
+import os
+
+
+class MediaCache:
+    """Downloaded files kept on disk, so the same media isn't fetched twice.
+
+    Files are stored by the hash of their contents, so one found under
+    several URLs is only kept once. Each URL gets a small file naming its
+    content along with the name and extension worked out for it, so that
+    doesn't need redoing either.
+
+    Once the contents go over max_size bytes, the least recently used are
+    deleted, along with the URL files naming them. Using a file touches
+    its modification time, which is how the order survives restarts.
+    Whatever a crash left behind (temporary files, URL files naming
+    deleted contents) is cleaned up on startup. Disk access happens in
+    worker threads, the bookkeeping on the event loop.
+    """
+
+    def __init__(self, directory="media_cache", max_size=512 * 1024 * 1024):
+        self.content_directory = os.path.join(directory, "content")
+        self.url_directory = os.path.join(directory, "urls")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.content_directory, exist_ok=True)
+        os.makedirs(self.url_directory, exist_ok=True)
+
+        # Content hash -> size, least recently used first
+        self.contents = OrderedDict()
+        files = sorted(
+            (entry.stat().st_mtime, entry.name, entry.stat().st_size)
+            for entry in os.scandir(self.content_directory)
+            if not entry.name.endswith(".tmp"))
+
+        for _, content_hash, size in files:
+            self.contents[content_hash] = size
+
+        # URL hash -> content hash, and content hash -> URL hashes
+        self.url_contents = {}
+        self.content_urls = {}
+        self.clean_up()
+
+        self.size = sum(self.contents.values())
+
+    def __len__(self):
+        return len(self.contents)
+
+    def content_path(self, content_hash):
+        return os.path.join(self.content_directory, content_hash)
+
+    def url_path(self, url_hash):
+        return os.path.join(self.url_directory, url_hash)
+
+    @staticmethod
+    def hash_url(url):
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def clean_up(self):
+        """Load the URL files, and delete files that can't be used."""
+        for entry in os.scandir(self.url_directory):
+            if not entry.name.endswith(".tmp"):
+                with suppress(FileNotFoundError, ValueError):
+                    content_hash = self.read_entry(entry.name)[0]
+
+                    if content_hash in self.contents:
+                        self.link(entry.name, content_hash)
+                        continue
+
+            with suppress(FileNotFoundError):
+                os.remove(entry.path)
+
+        unused = [
+            content_hash for content_hash in self.contents
+            if content_hash not in self.content_urls]
+
+        for content_hash in unused:
+            del self.contents[content_hash]
+
+        self.remove(unused)
+
+        for entry in os.scandir(self.content_directory):
+            if entry.name.endswith(".tmp"):
+                with suppress(FileNotFoundError):
+                    os.remove(entry.path)
+
+    def link(self, url_hash, content_hash):
+        """Note that a URL now names some content."""
+        self.unlink(url_hash)
+        self.url_contents[url_hash] = content_hash
+        self.content_urls.setdefault(content_hash, set()).add(url_hash)
+
+    def unlink(self, url_hash):
+        content_hash = self.url_contents.pop(url_hash, None)
+
+        if content_hash in self.content_urls:
+            self.content_urls[content_hash].discard(url_hash)
+
+    async def get(self, url):
+        """Return the (data, name, extension) kept for a URL, or None."""
+        entry = await asyncio.to_thread(self.read, url)
+
+        if not entry:
+            self.misses += 1
+            return None
+
+        content_hash, *entry = entry
+
+        if content_hash not in self.contents:  # Evicted in the meantime
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.contents.move_to_end(content_hash)
+        return tuple(entry)
+
+    async def put(self, url, data: bytes, name, extension):
+        """Keep a URL's data, then make room if the cache got too big."""
+        if len(data) > self.max_size:
+            return
+
+        url_hash = self.hash_url(url)
+        content_hash = await asyncio.to_thread(
+            self.write, url_hash, data, name, extension)
+
+        if content_hash not in self.contents:
+            self.contents[content_hash] = len(data)
+            self.size += len(data)
+
+        self.contents.move_to_end(content_hash)
+        self.link(url_hash, content_hash)
+        evicted = []
+        evicted_urls = []
+
+        while self.size > self.max_size:
+            content_hash, size = self.contents.popitem(last=False)
+            self.size -= size
+            evicted.append(content_hash)
+
+            for url_hash in self.content_urls.pop(content_hash, ()):
+                del self.url_contents[url_hash]
+                evicted_urls.append(url_hash)
+
+        if evicted:
+            await asyncio.to_thread(self.remove, evicted, evicted_urls)
+
+    def read_entry(self, url_hash):
+        """Return the (content hash, name, extension) of a URL file."""
+        with open(self.url_path(url_hash), encoding="utf-8") as file:
+            content_hash, name, extension = file.read().split("\n")
+
+        return content_hash, name, extension
+
+    def read(self, url):
+        try:
+            content_hash, name, extension = self.read_entry(
+                self.hash_url(url))
+            path = self.content_path(content_hash)
+
+            with open(path, "rb") as file:
+                data = file.read()
+        except (FileNotFoundError, ValueError):
+            return None
+
+        os.utime(path)
+        return content_hash, data, name, extension
+
+    def write(self, url_hash, data, name, extension):
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self.content_path(content_hash)
+
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            self.replace(path, data)
+
+        entry = "\n".join((content_hash, name, extension))
+        self.replace(self.url_path(url_hash), entry.encode())
+        return content_hash
+
+    @staticmethod
+    def replace(path, data):
+        """Write a file so it's never seen half written."""
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix=".tmp")
+
+        with open(descriptor, "wb") as file:
+            file.write(data)
+
+        os.replace(temp_path, path)
+
+    def remove(self, content_hashes, url_hashes=()):
+        paths = [self.content_path(h) for h in content_hashes]
+        paths += [self.url_path(h) for h in url_hashes]
+
+        for path in paths:
+            with suppress(FileNotFoundError):
+                os.remove(path)
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Let something happen rate times a second, in bursts of up to burst.
+
+    Shared between tasks, it keeps them all under one budget together.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    async def acquire(self):
+        """Wait until there's a token to spend, and spend it."""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
@@ -0,0 +1,67 @@
+import asyncio
+
+from utils.cooldowns import Cooldowns
+
+
+class RefreshScheduler:
+    """Run refreshes per key, one at a time, without losing or repeating any.
+
+    A refresh recomputes something from the current state (a starboard
+    post, a queue embed), so everything submitted for a key while a run
+    of it is going is owed exactly one more run afterwards, however much
+    was submitted. The latest submitted function is the one that runs.
+    Runs of a key are spaced at least the given seconds apart, using the
+    bot's cooldowns.
+    """
+
+    def __init__(self, cooldowns: Cooldowns):
+        self.cooldowns = cooldowns
+        self.jobs = {}
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def submit(self, key, func, seconds=0):
+        """Ask for await func() to happen for key.
+
+        Return a future that's done when a run that started after this
+        call finishes, with the exception of that run if it failed. Every
+        caller gets its own, so cancelling it doesn't cancel the run for
+        the others.
+        """
+        loop = asyncio.get_running_loop()
+        job = self.jobs.get(key)
+
+        if not job:
+            job = self.jobs[key] = {"pending": None}
+            job["task"] = loop.create_task(self.run(key, job))
+
+        job["func"] = func
+        job["seconds"] = seconds
+
+        if not job["pending"]:
+            job["pending"] = loop.create_future()
+
+        return asyncio.shield(job["pending"])
+
+    async def run(self, key, job):
+        try:
+            while job["pending"]:
+                await self.cooldowns.wait(key, job["seconds"])
+
+                # Whatever is submitted from here on needs another run
+                done, job["pending"] = job["pending"], None
+
+                try:
+                    await job["func"]()
+                except Exception as e:
+                    if not done.done():
+                        done.set_exception(e)
+                else:
+                    if not done.done():
+                        done.set_result(None)
+        finally:
+            del self.jobs[key]
+
+            if job["pending"]:
+                job["pending"].cancel()
@@ -0,0 +1,58 @@
+from functools import partial
+import asyncio
+import time
+
+import discord
+
+from utils.cache import LRUCache
+
+
+class SingleFlight:
+    """Share one call between everyone asking for the same key at once.
+
+    The first caller of a key starts the call as a task, anyone asking
+    for that key before it's done awaits the same task. Callers are
+    shielded from each other, so one of them getting cancelled doesn't
+    cancel the call for the rest.
+
+    A call failing with NotFound is remembered for not_found_seconds, and
+    asking for its key again in that time raises the same error without
+    calling anything.
+    """
+
+    def __init__(self, not_found_seconds=60, not_found_size=1024):
+        self.calls = {}
+        self.not_found = LRUCache(maxsize=not_found_size)
+        self.not_found_seconds = not_found_seconds
+        self.shared = 0
+
+    def __len__(self):
+        return len(self.calls)
+
+    async def run(self, key, func):
+        """Return await func(), or the result of the same call for key."""
+        if found := self.not_found.get(key):
+            expires_at, error = found
+
+            if time.monotonic() < expires_at:
+                raise error
+
+            self.not_found.pop(key)
+
+        if task := self.calls.get(key):
+            self.shared += 1
+        else:
+            task = self.calls[key] = asyncio.ensure_future(func())
+            task.add_done_callback(partial(self.done, key))
+
+        return await asyncio.shield(task)
+
+    def done(self, key, task: asyncio.Task):
+        del self.calls[key]
+
+        if task.cancelled():
+            return
+
+        if isinstance(error := task.exception(), discord.NotFound):
+            expires_at = time.monotonic() + self.not_found_seconds
+            self.not_found.put(key, (expires_at, error))